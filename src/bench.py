@@ -0,0 +1,269 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from blocks import INLINE_CACHE, BlockType, markdown_to_blocks, block_to_block_type, markdown_to_html_node
+from highlight import HIGHLIGHT_CACHE
+from htmlnode import ParentNode
+from template import Template
+from textnode import TextNode, TextType, split_nodes_delimiter, split_nodes_image, split_nodes_link, \
+    split_nodes_quotes, text_to_textnodes
+
+WORDS = ("the ring hobbit wizard elf shire mordor river mountain song fellowship journey shadow light "
+         "tower forest king sword road night star ancient merry tale council").split()
+SHAPES = ('small', 'huge', 'links', 'code')
+# (pages, paragraphs per page) for a corpus of size 1
+SHAPE_SIZES = {'small': (200, 4), 'huge': (2, 2000), 'links': (50, 40), 'code': (50, 40)}
+STAGES = ('block_split', 'block_type', 'inline_parse', 'parse', 'serialize', 'template_fill', 'write')
+BENCH_TEMPLATE = '<html><head><title>{{ Title }}</title><link href="/index.css" /></head>' \
+                 '<body><article>{{ Content }}</article></body></html>'
+
+
+def sentence(rng, words=12):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def paragraph(rng, shape):
+    parts = []
+    for _ in range(rng.randint(3, 6)):
+        text = sentence(rng)
+        roll = rng.random()
+        if shape == 'links':
+            text += f" [{rng.choice(WORDS)}](/blog/{rng.choice(WORDS)}/) and ![{rng.choice(WORDS)}](/images/{rng.choice(WORDS)}.png)"
+        elif roll < 0.2:
+            text += f" **{rng.choice(WORDS)}**"
+        elif roll < 0.4:
+            text += f" _{rng.choice(WORDS)}_"
+        elif roll < 0.5:
+            text += f" `{rng.choice(WORDS)}`"
+        parts.append(text + '.')
+    return '\n'.join(parts)
+
+
+def block(rng, shape, idx):
+    if shape == 'code' and idx % 2:
+        lines = [f"    {sentence(rng, 6).replace(' ', '_')} = {rng.randint(0, 999)}" for _ in range(rng.randint(5, 20))]
+        return '```\n' + '\n'.join(lines) + '\n```'
+    roll = rng.random()
+    if roll < 0.1:
+        return f"## {sentence(rng, 4)}"
+    if roll < 0.2:
+        return '\n'.join(f"- {sentence(rng, 6)}" for _ in range(rng.randint(2, 6)))
+    if roll < 0.25:
+        return '\n'.join(f"{n + 1}. {sentence(rng, 6)}" for n in range(rng.randint(2, 6)))
+    if roll < 0.3:
+        return f"> {sentence(rng)}\n> {sentence(rng)}"
+    return paragraph(rng, shape)
+
+
+def generate_page_markdown(rng, shape, paragraphs):
+    blocks = [f"# {sentence(rng, 5)}"]
+    blocks.extend(block(rng, shape, idx) for idx in range(paragraphs))
+    return '\n\n'.join(blocks) + '\n'
+
+
+def generate_corpus(root, shape, scale=1.0, seed=0):
+    # deterministic for a given (shape, scale, seed), returns the page paths
+    rng = random.Random(f"{shape}-{seed}")
+    pages, paragraphs = SHAPE_SIZES[shape]
+    pages = max(1, int(pages * scale))
+    paths = []
+    for n in range(pages):
+        path = os.path.join(root, shape, f"page{n:05d}", "index.md")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(generate_page_markdown(rng, shape, paragraphs))
+        paths.append(path)
+    return paths
+
+
+def inline_texts(blocks):
+    texts = []
+    for block_text in blocks:
+        match block_to_block_type(block_text):
+            case BlockType.PARA:
+                texts.append(' '.join(block_text.split()))
+            case BlockType.HEADING:
+                texts.append(block_text.lstrip('#').strip())
+            case BlockType.UNORDERED | BlockType.ORDERED:
+                texts.extend(line.split(' ', 1)[-1] for line in block_text.split('\n'))
+            case BlockType.QUOTE:
+                texts.append(block_text)
+    return texts
+
+
+def time_stage(timings, stage, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    timings[stage] += time.perf_counter() - start
+    return result
+
+
+def chained_text_to_textnodes(text):
+    # the pass-per-syntax pipeline text_to_textnodes replaced
+    nodes = [TextNode(text, text_type=TextType.TEXT)]
+    nodes = split_nodes_quotes(split_nodes_link(split_nodes_image(nodes)))
+    for delimiter, text_type in (('**', TextType.BOLD), ('_', TextType.ITALIC), ('`', TextType.CODE)):
+        nodes = split_nodes_delimiter(nodes, delimiter, text_type)
+    return nodes
+
+
+def bench_inline(seed=0, count=2000, repeat=5):
+    # nanoseconds per text for plain prose, which takes the character pre-check
+    # fast path, and for text with inline markup, against the chained passes
+    rng = random.Random(f"inline-{seed}")
+    texts = {
+        'plain': [sentence(rng) + '.' for _ in range(count)],
+        'formatted': [f"{sentence(rng, 6)} **{rng.choice(WORDS)}** [{rng.choice(WORDS)}](/blog/) `x` _y_"
+                      for _ in range(count)],
+    }
+    parsers = {'text_to_textnodes': text_to_textnodes, 'chained': chained_text_to_textnodes}
+    results = {}
+    for kind, samples in texts.items():
+        results[kind] = {}
+        for name, parse in parsers.items():
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                for text in samples:
+                    parse(text)
+                seconds = time.perf_counter() - start
+                best = seconds if best is None else min(best, seconds)
+            results[kind][name] = best * 1e9 / count
+    return results
+
+
+def clear_caches():
+    # every repeat starts cold, or all but the first would time cache lookups
+    # instead of the inline parse and highlighting
+    INLINE_CACHE.clear()
+    HIGHLIGHT_CACHE.clear()
+
+
+def bench_pages(paths, out_dir):
+    clear_caches()
+    timings = dict.fromkeys(STAGES, 0.0)
+    template = Template(BENCH_TEMPLATE, '/bench/')
+    for n, path in enumerate(paths):
+        with open(path, "r", encoding="utf-8") as f:
+            contents = f.read()
+        blocks = time_stage(timings, 'block_split', markdown_to_blocks, contents)
+        time_stage(timings, 'block_type', lambda: [block_to_block_type(b) for b in blocks])
+        texts = inline_texts(blocks)
+        time_stage(timings, 'inline_parse', lambda: [text_to_textnodes(t) for t in texts])
+        node = time_stage(timings, 'parse', markdown_to_html_node, contents)
+        html = time_stage(timings, 'serialize', node.to_html)
+        page = time_stage(timings, 'template_fill', template.render, {'Title': 'bench', 'Content': html})
+
+        def write():
+            with open(os.path.join(out_dir, f"{n}.html"), "w", encoding="utf-8") as f:
+                f.write(page)
+        time_stage(timings, 'write', write)
+    return timings
+
+
+def count_nodes(node):
+    count = 1
+    if isinstance(node, ParentNode):
+        for child in node.children:
+            count += count_nodes(child)
+    return count
+
+
+def measure_memory(shape='huge', scale=1.0, seed=0):
+    # memory held by the parsed node tree and by the inline TextNodes of one
+    # large document
+    rng = random.Random(f"{shape}-{seed}")
+    pages, paragraphs = SHAPE_SIZES[shape]
+    contents = generate_page_markdown(rng, shape, max(1, int(pages * paragraphs * scale)))
+    texts = inline_texts(markdown_to_blocks(contents))
+    clear_caches()
+    tracemalloc.start()
+    try:
+        node = markdown_to_html_node(contents)
+        tree_bytes, tree_peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        start = tracemalloc.get_traced_memory()[0]
+        text_nodes = [text_to_textnodes(text) for text in texts]
+        text_bytes = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+    html_nodes = count_nodes(node)
+    text_node_count = sum(len(nodes) for nodes in text_nodes)
+    return {
+        'bytes': len(contents.encode('utf-8')),
+        'html_nodes': html_nodes,
+        'html_tree_bytes': tree_bytes,
+        'html_tree_peak_bytes': tree_peak,
+        'bytes_per_html_node': tree_bytes / html_nodes,
+        'text_nodes': text_node_count,
+        'text_node_bytes': text_bytes,
+        'bytes_per_text_node': text_bytes / max(1, text_node_count),
+    }
+
+
+def run(shapes, scale=1.0, seed=0, repeat=3):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for shape in shapes:
+            paths = generate_corpus(os.path.join(tmp, 'content'), shape, scale, seed)
+            out_dir = os.path.join(tmp, 'out', shape)
+            os.makedirs(out_dir)
+            runs = [bench_pages(paths, out_dir) for _ in range(repeat)]
+            results[shape] = {
+                'pages': len(paths),
+                'bytes': sum(os.path.getsize(path) for path in paths),
+                # the fastest run is the least noisy estimate of each stage
+                'stages': {stage: min(r[stage] for r in runs) for stage in STAGES},
+            }
+    return results
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Benchmark each build stage on synthetic corpora.')
+    parser.add_argument('--shape', choices=SHAPES + ('all',), default='all')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiply the page count of every corpus')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--memory', action='store_true',
+                        help='also measure the memory held by the node tree of one large document')
+    parser.add_argument('--inline', action='store_true',
+                        help='also time the inline parser on plain and formatted text')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    shapes = SHAPES if args.shape == 'all' else (args.shape,)
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'scale': args.scale,
+        'seed': args.seed,
+        'corpora': run(shapes, args.scale, args.seed, args.repeat),
+    }
+    for shape, result in report['corpora'].items():
+        stages = '  '.join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in result['stages'].items())
+        print(f"{shape:>6}: {result['pages']} pages, {result['bytes']} bytes  {stages}")
+    if args.memory:
+        report['memory'] = measure_memory(scale=args.scale, seed=args.seed)
+        memory = report['memory']
+        print(f"memory: {memory['html_nodes']} html nodes in {memory['html_tree_bytes']} bytes "
+              f"({memory['bytes_per_html_node']:.0f} B/node), {memory['text_nodes']} text nodes in "
+              f"{memory['text_node_bytes']} bytes ({memory['bytes_per_text_node']:.0f} B/node)")
+    if args.inline:
+        report['inline'] = bench_inline(seed=args.seed, repeat=args.repeat)
+        for kind, timings in report['inline'].items():
+            print(f"inline {kind:>9}: " + '  '.join(f"{name}={ns:.0f}ns" for name, ns in timings.items()))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
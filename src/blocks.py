@@ -1,8 +1,22 @@
 import re
 from enum import Enum
 
-from htmlnode import ParentNode, LeafNode
-from textnode import text_node_to_html_node, text_to_textnodes
+from highlight import fence_language, highlight_code
+from htmlnode import FragmentNode, ParentNode, LeafNode
+from lru import LRUCache
+from textnode import TextType, text_node_to_html_node, text_to_textnodes
+
+
+# bump whenever a change to the parser changes the node trees it produces,
+# cached trees from older versions are then ignored
+PARSER_VERSION = 4
+
+# inline text -> its rendered HTML and link targets, shared by every page parsed
+# in this process. Long texts are rarely repeated, so they are not kept.
+INLINE_CACHE = LRUCache(4096)
+INLINE_CACHE_MAX_TEXT = 1024
+
+INLINE_FORMATTING_PATTERN = re.compile(r"(\*\*.*?\*\*?\*\*|_.*?_|`.*?`)")
 
 
 class BlockType(Enum):
@@ -14,48 +28,113 @@ class BlockType(Enum):
     ORDERED = 'ordered_list'
 
 
+def split_block_lines(lines, fences=True):
+    # Walks the lines once and yields each block as a list of lines, trimmed the
+    # way block.strip() would trim the joined text. Blocks end at an empty line,
+    # like splitting on "\n\n", except inside a ``` fence, which runs to its
+    # closing line even across blank lines.
+    current = []
+    started = False
+    in_fence = False
+    for line in lines:
+        if in_fence:
+            current.append(line)
+            if line.rstrip().endswith('```'):
+                yield _trim_block(current)
+                current = []
+                started = in_fence = False
+            continue
+        if line == '':
+            if started:
+                yield _trim_block(current)
+            current = []
+            started = False
+            continue
+        if not started and not line.isspace():
+            started = True
+            opening = line.strip()
+            in_fence = fences and opening.startswith('```') and not (len(opening) >= 6 and opening.endswith('```'))
+        current.append(line)
+    if in_fence:
+        # never closed, so split it like any other text
+        yield from split_block_lines(current, fences=False)
+    elif started:
+        yield _trim_block(current)
+
+
+def _trim_block(lines):
+    start = 0
+    while lines[start].isspace():
+        start += 1
+    end = len(lines)
+    while lines[end - 1] == '' or lines[end - 1].isspace():
+        end -= 1
+    lines = lines[start:end]
+    lines[0] = lines[0].lstrip()
+    lines[-1] = lines[-1].rstrip()
+    return lines
+
+
 def markdown_to_blocks(markdown):
-    blocks = list(markdown.split("\n\n"))
-    result = []
-    for block in blocks:
-        block = block.strip()
-        if block:
-            result.append(block)
-    return result
+    return ['\n'.join(lines) for lines in split_block_lines(markdown.split('\n'))]
+
+
+def iter_blocks(lines):
+    # yields (block_type, block_lines) while walking the lines
+    for block_lines in split_block_lines(lines):
+        yield lines_to_block_type(block_lines), block_lines
 
 
 def block_to_block_type(block):
-    lines = block.split("\n")
+    return lines_to_block_type(block.split("\n"))
 
-    if block[0] == '#':
+
+def lines_to_block_type(lines):
+    first = lines[0]
+    if first[0] == '#':
         return BlockType.HEADING
-    elif block[0:3] == '```' and block[-3:] == '```':
+    elif first[0:3] == '```' and lines[-1][-3:] == '```':
         return BlockType.CODE
-    elif all(line.startswith('>') for line in lines):
+    # one scan that drops each candidate type as soon as a line rules it out
+    quote = first[0] == '>'
+    unordered = first[0] == '-'
+    ordered = first.startswith('1.')
+    if not (quote or unordered or ordered):
+        return BlockType.PARA
+    for idx, line in enumerate(lines):
+        if quote and not line.startswith('>'):
+            quote = False
+        if unordered and not line.startswith('-'):
+            unordered = False
+        if ordered and not _is_list_number(line, idx + 1):
+            ordered = False
+        if not (quote or unordered or ordered):
+            return BlockType.PARA
+    if quote:
         return BlockType.QUOTE
-    elif all(line.startswith('-') for line in lines):
+    if unordered:
         return BlockType.UNORDERED
-    elif is_ordered_list(lines):
-        return BlockType.ORDERED
-    else:
-        return BlockType.PARA
+    return BlockType.ORDERED
+
+
+def _is_list_number(line, number):
+    digits = str(number)
+    return line.startswith(digits) and line[len(digits):len(digits) + 1] == '.'
 
 
 def is_ordered_list(lines):
     if not lines:
         return False
-    for idx, line in enumerate(lines):
-        expected = f"{idx + 1}."
-        if not line.startswith(expected):
-            return False
-    return True
+    return all(_is_list_number(line, idx + 1) for idx, line in enumerate(lines))
 
 
 def handle_list_items(text):
-    lines = text.split("\n")
-    li_nodes = []
+    return handle_list_lines(text.split("\n"))
 
 
+def handle_list_lines(lines):
+    li_nodes = []
+
     for line in lines:
         line = line.strip()
         if not line:
@@ -77,13 +156,22 @@ def handle_list_items(text):
 
 
 def text_to_children(block):
-    text_nodes = text_to_textnodes(block)
-    html_nodes = []
-    for node in text_nodes:
-        html_node = text_node_to_html_node(node)
-        html_nodes.append(html_node)
+    # the inline nodes are rendered once and kept as a single raw fragment, so
+    # text repeated across pages skips the inline parse altogether
+    if len(block) > INLINE_CACHE_MAX_TEXT:
+        return [FragmentNode(*render_inline(block))]
+    fragment = INLINE_CACHE.get(block)
+    if fragment is None:
+        fragment = render_inline(block)
+        INLINE_CACHE.put(block, fragment)
+    return [FragmentNode(*fragment)]
+
 
-    return html_nodes
+def render_inline(text):
+    # (html, urls of the links and images in it)
+    nodes = text_to_textnodes(text)
+    html = ''.join(text_node_to_html_node(node).to_html() for node in nodes)
+    return html, tuple(node.url for node in nodes if node.text_type in (TextType.LINK, TextType.IMAGE))
 
 
 def get_heading_level(block):
@@ -103,44 +191,58 @@ def get_heading_level(block):
 
 
 def has_inline_formatting(content):
-    inline_pattern = r"(\*\*.*?\*\*?\*\*|_.*?_|`.*?`)"
-    return re.search(inline_pattern, content) is not None
+    if '*' not in content and '_' not in content and '`' not in content:
+        return False
+    return INLINE_FORMATTING_PATTERN.search(content) is not None
+
+
+def block_to_html_node(block_type, lines):
+    block = '\n'.join(lines)
+    match block_type:
+        case BlockType.PARA:
+            # Normalize whitespace in paragraph text
+            normalized_block = ' '.join(block.split())
+            return ParentNode(tag='p', children=text_to_children(normalized_block))
+        case BlockType.HEADING:
+            level = get_heading_level(block)
+            content = block[level + 1:].strip()
+            if has_inline_formatting(content):
+                return ParentNode(tag=f"h{level}", children=text_to_children(content))
+            return LeafNode(tag=f"h{level}", value=content)
+        case BlockType.UNORDERED:
+            return ParentNode(tag='ul', children=handle_list_lines(lines))
+        case BlockType.ORDERED:
+            return ParentNode(tag='ol', children=handle_list_lines(lines))
+        case BlockType.QUOTE:
+            return ParentNode(tag='blockquote', children=text_to_children(block))
+        case BlockType.CODE:
+            content = '\n'.join(lines[1:-1])
+            content += '\n'
+            # ```python highlights the block, a bare ``` stays plain text
+            language = fence_language(lines[0])
+            highlighted = highlight_code(content, language)
+            if highlighted is not None:
+                code_node = LeafNode(tag='code', value=highlighted, props={'class': f"language-{language}"})
+                return ParentNode(tag='pre', children=[code_node], props={'class': 'highlight'})
+            code_node = LeafNode(tag='code', value=content)
+            return ParentNode(tag='pre', children=[code_node])
 
 
 def markdown_to_html_node(markdown):
-    blocks = markdown_to_blocks(markdown)
     parent = ParentNode(tag='div', children=[])
-    for block in blocks:
-        block_type = block_to_block_type(block)
-        match block_type:
-            case BlockType.PARA:
-                # Normalize whitespace in paragraph text
-                import re
-                normalized_block = re.sub(r'\s+', ' ', block).strip()
-                p_node = ParentNode(tag='p', children=text_to_children(normalized_block))
-                parent.children.append(p_node)
-            case BlockType.HEADING:
-                level = get_heading_level(block)
-                content = block[level + 1:].strip()
-                if has_inline_formatting(content):
-                    h_node = ParentNode(tag=f"h{level}", children=text_to_children(content))
-                else:
-                    h_node = LeafNode(tag=f"h{level}", value=content)
-                parent.children.append(h_node)
-            case BlockType.UNORDERED:
-                ul_node = ParentNode(tag='ul', children=handle_list_items(block))
-                parent.children.append(ul_node)
-            case BlockType.ORDERED:
-                ol_node = ParentNode(tag='ol', children=handle_list_items(block))
-                parent.children.append(ol_node)
-            case BlockType.QUOTE:
-                quote_node = ParentNode(tag='blockquote', children=text_to_children(block))
-                parent.children.append(quote_node)
-            case BlockType.CODE:
-                content = '\n'.join(block.split('\n')[1:-1])
-                content += '\n'
-                code_node = LeafNode(tag='code', value=content)
-                pre_node = ParentNode(tag='pre', children=[code_node])
-                parent.children.append(pre_node)
-
+    for block_type, lines in iter_blocks(markdown.split('\n')):
+        parent.children.append(block_to_html_node(block_type, lines))
     return parent
+
+
+def iter_markdown_html(lines):
+    # Same output as markdown_to_html_node(...).to_html(), but each block is
+    # rendered and yielded as soon as it closes, so only one block is ever in
+    # memory. lines can be any iterable, e.g. a file read line by line.
+    opened = False
+    for block_type, block_lines in iter_blocks(lines):
+        if not opened:
+            yield '<div>'
+            opened = True
+        yield from block_to_html_node(block_type, block_lines).iter_html()
+    yield '</div>' if opened else '<div></div>'
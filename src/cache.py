@@ -0,0 +1,121 @@
+import hashlib
+import logging
+import marshal
+import os
+import zlib
+
+from blocks import PARSER_VERSION, markdown_to_html_node
+from highlight import HIGHLIGHTER_VERSION
+from htmlnode import FragmentNode, LeafNode, ParentNode
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join('.cache', 'ast')
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+LEAF = 0
+PARENT = 1
+FRAGMENT = 2
+
+
+def node_to_tuple(node):
+    if isinstance(node, ParentNode):
+        return PARENT, node.tag, node.props, [node_to_tuple(child) for child in node.children]
+    if isinstance(node, FragmentNode):
+        return FRAGMENT, node.value, node.targets
+    return LEAF, node.tag, node.value, node.props
+
+
+def node_from_tuple(item):
+    if item[0] == PARENT:
+        _, tag, props, children = item
+        return ParentNode(tag, [node_from_tuple(child) for child in children], props)
+    if item[0] == FRAGMENT:
+        _, value, targets = item
+        return FragmentNode(value, targets)
+    _, tag, value, props = item
+    return LeafNode(tag, value, props=props)
+
+
+class ASTCache:
+    # Parsed node trees on disk, keyed by the source text and the parser
+    # version. Hits refresh the entry's mtime and evict() drops the least
+    # recently used entries once the cache grows past max_bytes. Worker
+    # processes get a pickled copy and share the same directory.
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, contents):
+        h = hashlib.sha256(f"{PARSER_VERSION}:{HIGHLIGHTER_VERSION}:{marshal.version}\0".encode("utf-8"))
+        h.update(contents.encode("utf-8"))
+        return h.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, contents):
+        path = self.path(self.key(contents))
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            node = node_from_tuple(marshal.loads(zlib.decompress(data)))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, EOFError, TypeError, IndexError, zlib.error) as e:
+            logger.warning(f"Ignoring unreadable cache entry {path}: {e}")
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return node
+
+    def put(self, contents, node):
+        path = self.path(self.key(contents))
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(zlib.compress(marshal.dumps(node_to_tuple(node)), 1))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write cache entry {path}: {e}")
+
+    def parse(self, contents):
+        node = self.get(contents)
+        if node is not None:
+            self.hits += 1
+            return node
+        self.misses += 1
+        node = markdown_to_html_node(contents)
+        self.put(contents, node)
+        return node
+
+    def evict(self):
+        entries = []
+        total = 0
+        for dirpath, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+                total += stat.st_size
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        if removed:
+            logger.info(f"Evicted {removed} AST cache entries")
+        return removed
@@ -0,0 +1,113 @@
+import os
+import re
+
+from manifest import hash_file, record_page
+
+# root relative markdown links and images, e.g. [tom](/blog/tom)
+LINK_TARGET_PATTERN = re.compile(r"\]\((/[^)\s]*)\)")
+
+
+def link_source(url, content_dir):
+    # the markdown source a root relative link points at, None for assets
+    path = url.split('#', 1)[0].split('?', 1)[0].strip('/')
+    name = os.path.basename(path)
+    if name.endswith('.html'):
+        return os.path.join(content_dir, path[:-len('.html')] + '.md')
+    if '.' in name:
+        return None
+    return os.path.join(content_dir, path, 'index.md')
+
+
+def page_links(contents, content_dir):
+    links = []
+    for url in LINK_TARGET_PATTERN.findall(contents):
+        target = link_source(url, content_dir)
+        if target is not None and target not in links:
+            links.append(target)
+    return links
+
+
+class DependencyGraph:
+    # Decides which pages to rebuild from what the manifest says each one was
+    # built from last time: its source, its template and partials, and which
+    # of the pages it links to existed. Every input file is hashed at most
+    # once per build.
+    def __init__(self, manifest, sources=()):
+        self.manifest = manifest
+        self.sources = set(sources)
+        self.hashes = {}
+
+    def file_hash(self, path):
+        if path not in self.hashes:
+            try:
+                self.hashes[path] = hash_file(path)
+            except FileNotFoundError:
+                self.hashes[path] = None
+        return self.hashes[path]
+
+    def stat_hash(self, source_path, size, mtime_ns):
+        # the recorded source hash when the file still has the size and mtime
+        # it had when it was hashed, so it need not be read again
+        entry = self.manifest['pages'].get(source_path)
+        if entry is None or entry['hash'] is None:
+            return None
+        if entry.get('size') != size or entry.get('mtime') != mtime_ns:
+            return None
+        return entry['hash']
+
+    def targets(self, source_path):
+        # the hrefs and srcs the page had when it was last built
+        return self.manifest['pages'].get(source_path, {}).get('targets', [])
+
+    def template_name(self, source_path):
+        # the template its front matter named when it was last built
+        return self.manifest['pages'].get(source_path, {}).get('template')
+
+    def output_hash(self, source_path, output_path):
+        # the hash of the HTML the page was last written with, so an unchanged
+        # output is known without reading it back
+        entry = self.manifest['pages'].get(source_path)
+        if entry is None or entry['output'] != output_path:
+            return None
+        return entry.get('output_hash')
+
+    def dependencies(self, files):
+        return {path: self.file_hash(path) for path in files}
+
+    def reasons(self, source_path, source_hash, output_path, deps):
+        # why the page has to be rebuilt, an empty list when it is current
+        entry = self.manifest['pages'].get(source_path)
+        if entry is None:
+            return ['new page']
+        if entry['hash'] is None:
+            return ['full rebuild']
+        reasons = []
+        if entry['hash'] != source_hash:
+            reasons.append('source changed')
+        if entry['output'] != output_path:
+            reasons.append('output path changed')
+        elif not os.path.exists(output_path):
+            reasons.append('output missing')
+        old_deps = entry.get('deps', {})
+        for path, digest in deps.items():
+            if path not in old_deps:
+                reasons.append(f"now uses {path}")
+            elif old_deps[path] != digest:
+                reasons.append(f"{path} changed")
+        for path in old_deps:
+            if path not in deps:
+                reasons.append(f"no longer uses {path}")
+        for target, existed in entry.get('links', {}).items():
+            if (target in self.sources) != existed:
+                reasons.append(f"linked page {target} was {'removed' if existed else 'added'}")
+        return reasons
+
+    def record(self, source_path, source_hash, output_path, deps, links, size=None, mtime_ns=None, targets=None,
+               template_name=None, output_hash=None):
+        links = {target: target in self.sources for target in links}
+        record_page(self.manifest, source_path, source_hash, output_path, deps, links, targets)
+        entry = self.manifest['pages'][source_path]
+        entry['size'] = size
+        entry['mtime'] = mtime_ns
+        entry['template'] = template_name
+        entry['output_hash'] = output_hash
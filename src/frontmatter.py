@@ -0,0 +1,136 @@
+import datetime
+import io
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+try:
+    import tomllib
+except ImportError:
+    tomllib = None
+
+FRONT_MATTER_FENCE = '---'
+TOML_FENCE = '+++'
+
+
+def parse_value(value):
+    value = value.strip()
+    if value.startswith('[') and value.endswith(']'):
+        return [parse_value(item) for item in value[1:-1].split(',') if item.strip()]
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'':
+        return value[1:-1]
+    return value
+
+
+def parse_simple(header):
+    # "key: value" lines, used when PyYAML is not installed or can not read
+    # the header
+    meta = {}
+    for line in header:
+        key, sep, value = line.partition(':')
+        if sep and key.strip():
+            meta[key.strip().lower()] = parse_value(value)
+    return meta
+
+
+def _plain(value):
+    # dates become ISO strings and nested values plain lists and dicts, so the
+    # metadata can go into the JSON manifest as is
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): _plain(item) for key, item in value.items()}
+    return value
+
+
+def parse_header(fence, header):
+    if fence == TOML_FENCE:
+        if tomllib is None:
+            raise Exception("TOML front matter needs Python 3.11 or later")
+        meta = tomllib.loads('\n'.join(header))
+    elif yaml is not None:
+        try:
+            meta = yaml.safe_load('\n'.join(header))
+        except yaml.YAMLError:
+            meta = parse_simple(header)
+        if meta is None:
+            meta = {}
+        elif not isinstance(meta, dict):
+            raise Exception("front matter must be a mapping of keys to values")
+    else:
+        return parse_simple(header)
+    return {str(key).lower(): _plain(value) for key, value in meta.items()}
+
+
+def split_front_matter_lines(lines):
+    # Reads a "---" delimited YAML, or "+++" delimited TOML, block from the
+    # start of lines and returns (metadata, lines after it). Without one the
+    # metadata is empty and every line is given back. Only the header is read
+    # from lines, so with a file it stops as soon as the header ends.
+    lines = iter(lines)
+    first = next(lines, None)
+    if first is None:
+        return {}, iter(())
+    fence = first.rstrip()
+    if fence != FRONT_MATTER_FENCE and fence != TOML_FENCE:
+        return {}, _chain(first, lines)
+    header = []
+    for line in lines:
+        if line.rstrip() == fence:
+            break
+        header.append(line)
+    else:
+        # never closed, so it was not front matter
+        return {}, _chain(first, iter(header))
+    return parse_header(fence, header), lines
+
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+
+def split_front_matter(text):
+    if not text.startswith((FRONT_MATTER_FENCE, TOML_FENCE)):
+        return {}, text
+    meta, lines = split_front_matter_lines(text.split('\n'))
+    return meta, '\n'.join(lines)
+
+
+def front_matter(text):
+    # the metadata alone, the body is never split or copied
+    if not text.startswith((FRONT_MATTER_FENCE, TOML_FENCE)):
+        return {}
+    meta, _ = split_front_matter_lines(line.rstrip('\n') for line in io.StringIO(text))
+    return meta
+
+
+def read_front_matter(path):
+    # the metadata of a file, reading only up to the end of its header
+    with open(path, "r", encoding="utf-8") as f:
+        first = f.readline()
+        if first.rstrip() not in (FRONT_MATTER_FENCE, TOML_FENCE):
+            return {}
+        f.seek(0)
+        meta, _ = split_front_matter_lines(line.rstrip('\n') for line in f)
+    return meta
+
+
+def meta_list(meta, key):
+    value = meta.get(key)
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    return [str(item).strip() for item in value if str(item).strip()]
+
+
+def meta_bool(meta, key):
+    value = meta.get(key, False)
+    if isinstance(value, str):
+        return value.strip().lower() in ('true', 'yes', 'on', '1')
+    return bool(value)
@@ -1,10 +1,36 @@
+import html
+import logging
 import os
-import shutil
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import chain, islice
 
-from blocks import markdown_to_html_node
+from blocks import INLINE_CACHE, iter_markdown_html, markdown_to_html_node
+from depgraph import DependencyGraph, page_links
+from frontmatter import front_matter, meta_bool, read_front_matter, split_front_matter, split_front_matter_lines
+from images import add_image_attributes, image_deps, page_images
+from linkcheck import node_targets
+from listings import index_entry, write_listings
+from manifest import hash_file, hash_string, update_inputs, prune_pages
+from postprocess import minify_html
+from profiler import NULL_PROFILER, Profiler
+from template import find_template, load_template
+from walk import scan_tree
+from writer import DEFAULT_IO_THREADS, OutputFile, WriteQueue, make_dirs, read_ahead
 
+logger = logging.getLogger(__name__)
 
-def extract_title(markdown):
+# sources bigger than this are streamed block by block instead of being read,
+# parsed and rendered in one piece
+STREAM_THRESHOLD = 16 * 1024 * 1024
+
+
+def extract_title(markdown, meta=None):
+    # the title from the front matter, or the first heading of a page without
+    # one, the listings and the sitemap go by the same rule
+    if meta and meta.get('title') is not None:
+        return str(meta['title'])
     lines = markdown.split('\n')
     for line in lines:
         if line.startswith('#'):
@@ -12,70 +38,473 @@ def extract_title(markdown):
     raise Exception("no title found")
 
 
-def copy_static_files(src, dst):
-    if os.path.exists(dst):
-        shutil.rmtree(dst)
-    os.makedirs(dst)
-    src_contents = os.listdir(src)
-    for filename in src_contents:
-        src_path = os.path.join(src, filename)
-        dst_path = os.path.join(dst, filename)
-        print(f"Copying {src_path} to {dst_path}")
-        if os.path.isdir(src_path):
+def read_text(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def scan_title(path):
+    with open(path, "r", encoding="utf-8") as f:
+        meta, lines = split_front_matter_lines(read_lines(f))
+        if meta.get('title') is not None:
+            return str(meta['title'])
+        for line in lines:
+            if line.startswith('#'):
+                return line[2:].strip()
+    raise Exception("no title found")
+
+
+def page_metadata(source_path, contents):
+    # the front matter and title of a page, without parsing its body. A title
+    # in the front matter saves reading past the header.
+    if contents is None:
+        meta = read_front_matter(source_path)
+        if meta.get('title') is not None:
+            return meta, str(meta['title'])
+        return meta, scan_title(source_path)
+    meta, body = split_front_matter(contents)
+    return meta, extract_title(body, meta)
+
+
+def meta_context(meta):
+    # front matter values for the template, e.g. {{ date }} or {{ tags }}
+    context = {}
+    for key, value in meta.items():
+        if isinstance(value, list):
+            value = ', '.join(str(item) for item in value)
+        elif isinstance(value, dict):
+            continue
+        context[key] = html.escape(str(value))
+    return context
+
+
+def is_draft(source_path, size, mtime_ns, built=None):
+    # Only the header of the file is read. built is the pages entries of the
+    # manifest, a page built last time with the same size and mtime was no
+    # draft then and is not one now, so it is not even opened.
+    entry = built.get(source_path) if built else None
+    if entry is not None and entry.get('size') == size and entry.get('mtime') == mtime_ns:
+        return False
+    return meta_bool(read_front_matter(source_path), 'draft')
+
+
+def read_lines(fp):
+    for line in fp:
+        yield line[:-1] if line.endswith('\n') else line
+
+
+class StreamedMarkdown:
+    # stands in for the content node of a page that is too big to parse in one
+    # go, the template pulls the HTML out of it a block at a time
+    def __init__(self, path):
+        self.path = path
+
+    def iter_html(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            _, lines = split_front_matter_lines(read_lines(f))
+            yield from iter_markdown_html(lines)
+
+
+def stream_page(source_path, output_path, template, known=None):
+    # returns the hash of the output, which is only replaced when it changed,
+    # see OutputFile
+    context = meta_context(read_front_matter(source_path))
+    context['Title'] = scan_title(source_path)
+    context['Content'] = StreamedMarkdown(source_path)
+    with OutputFile(output_path, known) as f:
+        template.write(f, context)
+    return f.digest
+
+
+def page_context(contents, ast_cache=None):
+    meta, body = split_front_matter(contents)
+    if ast_cache is not None:
+        html_node = ast_cache.parse(body)
+    else:
+        html_node = markdown_to_html_node(body)
+    context = meta_context(meta)
+    context['Title'] = extract_title(body, meta)
+    context['Content'] = html_node
+    return context
+
+
+def render_page(contents, template, profiler=NULL_PROFILER, page=None, ast_cache=None):
+    with profiler.stage('parse', page):
+        context = page_context(contents, ast_cache)
+    with profiler.stage('render', page):
+        return template.render(context)
+
+
+def write_page(fp, contents, template, profiler=NULL_PROFILER, page=None, ast_cache=None):
+    # the content node is streamed into fp chunk by chunk instead of being
+    # rendered to one string first, unless the stages are being timed
+    if profiler is NULL_PROFILER:
+        template.write(fp, page_context(contents, ast_cache))
+        return
+    html = render_page(contents, template, profiler, page, ast_cache)
+    with profiler.stage('write', page):
+        fp.write(html)
+
+
+@contextmanager
+def open_output(dest_path):
+    # write next to the destination and swap it in, so a failed page never
+    # leaves a truncated file behind
+    tmp_path = f"{dest_path}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            yield f
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def generate_page(from_path, template_path, dest_path, basepath):
+    logger.debug(f"Generating page from: {from_path} to {dest_path} using {template_path}")
+    with open(from_path, "r", encoding="utf-8") as f:
+        contents = f.read()
+    template = load_template(template_path, basepath)
+    with open_output(dest_path) as f:
+        write_page(f, contents, template)
+
+
+def scan_pages(dir_path_content, dest_dir_path):
+    # (source path, output path, size, mtime_ns) for every page, in walk order
+    pages = []
+    for rel_path, size, mtime_ns in scan_tree(dir_path_content, ".md"):
+        rel_dir, filename = os.path.split(rel_path)
+        output_path = os.path.join(dest_dir_path, rel_dir, filename.replace(".md", ".html"))
+        pages.append((os.path.join(dir_path_content, rel_path), output_path, size, mtime_ns))
+    return pages
+
+
+def collect_pages(dir_path_content, dest_dir_path):
+    return [(source_path, output_path) for source_path, output_path, _, _ in scan_pages(dir_path_content, dest_dir_path)]
+
+
+def render_output(contents, template, basepath, profiler=NULL_PROFILER, page=None, ast_cache=None, minify=False,
+                  images=None, collect=False):
+    # The finished HTML of a page and, when collect, every href and src in it,
+    # taken from the tree it was rendered from. images is the static images
+    # when pages show their sizes and variants, see process_images.
+    with profiler.stage('parse', page):
+        context = page_context(contents, ast_cache)
+    targets = node_targets(context['Content']) if collect or images is not None else None
+    with profiler.stage('render', page):
+        html = template.render(context)
+    if images is not None and targets:
+        with profiler.stage('images', page):
+            html = add_image_attributes(html, page_images(targets, images, basepath))
+    if minify:
+        with profiler.stage('minify', page):
+            html = minify_html(html)
+    return html, targets
+
+
+# the static images in each worker process, sent once when it starts instead
+# of with every page
+_worker_images = None
+
+
+def _init_worker(images):
+    global _worker_images
+    _worker_images = images
+
+
+def _render_job(job):
+    # runs in the worker processes, so failures come back as values instead of
+    # tearing down the pool
+    source_path, contents, template_path, basepath, profile, ast_cache, minify, collect = job
+    profiler = Profiler() if profile else NULL_PROFILER
+    # each worker has its own inline cache, its counters are added up in the parent
+    hits, misses = INLINE_CACHE.hits, INLINE_CACHE.misses
+    try:
+        html, targets = render_output(contents, load_template(template_path, basepath), basepath, profiler,
+                                      source_path, ast_cache, minify, _worker_images, collect)
+        error = None
+    except Exception as e:
+        html, targets, error = None, None, f"{type(e).__name__}: {e}"
+    return html, targets, error, profiler.records, (INLINE_CACHE.hits - hits, INLINE_CACHE.misses - misses)
+
+
+def _stream_job(job):
+    source_path, output_path, template_path, basepath, known = job
+    try:
+        return stream_page(source_path, output_path, load_template(template_path, basepath), known), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def _render_pages(pending, basepath, jobs, profiler, ast_cache, minify, images, known, collect):
+    # Yields (page, html, error, output hash, targets) for every pending page,
+    # in order. html is None for pages that were streamed straight to their
+    # output, which are never minified, and only those come with the hash.
+    # targets are the hrefs and srcs of rendered pages when collect or images,
+    # see render_output. pending can be a generator, pages are rendered as it
+    # yields them. known maps output paths to the hash they were last written
+    # with.
+    pending = iter(pending)
+    first = list(islice(pending, 2))
+    if jobs <= 1 or len(first) <= 1:
+        for page in chain(first, pending):
+            source_path, output_path, _, contents, template_path = page
+            logger.debug(f"Generating page from: {source_path} to {output_path} using {template_path}")
+            html = digest = targets = None
             try:
-                copy_static_files(src_path, dst_path)
+                template = load_template(template_path, basepath)
+                if contents is None:
+                    with profiler.stage('stream', source_path):
+                        digest = stream_page(source_path, output_path, template, known.get(output_path))
+                else:
+                    html, targets = render_output(contents, template, basepath, profiler, source_path, ast_cache,
+                                                  minify, images, collect)
             except Exception as e:
-                print(f"Failed to copy {filename}: {e}")
-        elif os.path.isfile(src_path):
+                yield page, None, f"{type(e).__name__}: {e}", None, None
+                continue
+            yield page, html, None, digest, targets
+        return
+
+    profile = profiler is not NULL_PROFILER
+    in_flight = deque()
+
+    def finish():
+        page, future = in_flight.popleft()
+        if page[3] is None:
+            digest, error = future.result()
+            return page, None, error, digest, None
+        html, targets, error, records, (hits, misses) = future.result()
+        profiler.merge(records)
+        INLINE_CACHE.hits += hits
+        INLINE_CACHE.misses += misses
+        return page, html, error, None, targets
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(images,)) as executor:
+        for page in chain(first, pending):
+            source_path, output_path, _, contents, template_path = page
+            if contents is None:
+                # streamed pages are written by the workers themselves so they
+                # never travel back through the pool as one big string
+                job = (source_path, output_path, template_path, basepath, known.get(output_path))
+                in_flight.append((page, executor.submit(_stream_job, job)))
+            else:
+                job = (source_path, contents, template_path, basepath, profile, ast_cache, minify, collect)
+                in_flight.append((page, executor.submit(_render_job, job)))
+            # a few pages per worker keep them all busy, without the sources
+            # of every page waiting in memory for a free worker
+            if len(in_flight) >= jobs * 4:
+                yield finish()
+        while in_flight:
+            yield finish()
+
+
+def write_pages(pending, basepath, jobs=1, profiler=NULL_PROFILER, ast_cache=None, io_threads=DEFAULT_IO_THREADS,
+                minify=False, images=None, known=None, collect=False):
+    # Yields (page, error, output hash, targets) for every pending page once
+    # its output is written, in order. Pages are rendered as pending yields
+    # them and written on I/O threads while the next ones render, each output
+    # directory is made once, before the first page that goes in it. Outputs
+    # that already hold the same HTML are left untouched, known maps output
+    # paths to the hash recorded for them so they need not be read back. It
+    # is filled in as pending yields pages, so it is passed on as is.
+    known = {} if known is None else known
+    made = set()
+
+    def with_dirs():
+        for page in pending:
+            make_dirs([page[1]], made)
+            yield page
+
+    results = deque()
+    written = 0
+
+    def finish():
+        nonlocal written
+        page, error, digest, targets, future = results.popleft()
+        if future is not None:
             try:
-                shutil.copy(src_path, dst)
+                changed, digest = future.result()
+                written += changed
             except Exception as e:
-                print(f"Failed to copy {filename}: {e}")
+                error = f"{type(e).__name__}: {e}"
+        return page, error, digest, targets
 
+    with WriteQueue(io_threads, profiler) as queue:
+        rendered = _render_pages(with_dirs(), basepath, jobs, profiler, ast_cache, minify, images, known, collect)
+        for page, html, error, digest, targets in rendered:
+            future = queue.submit(page[1], html, page[0], known.get(page[1])) if html is not None else None
+            results.append((page, error, digest, targets, future))
+            # pages already written are handed back while the rest render
+            while results and (results[0][4] is None or results[0][4].done()):
+                yield finish()
+    while results:
+        yield finish()
+    logger.debug(f"Wrote {written} changed output(s)")
 
-def generate_page(from_path, template_path, dest_path, basepath):
-    print(f"Generating page from: {from_path} to {dest_path} using {template_path}")
-    with open(from_path, "r", encoding="utf-8") as f:
-        contents = f.read()
-    with open(template_path, "r", encoding="utf-8") as f:
-        template_contents = f.read()
-    html_string = markdown_to_html_node(contents)
-    html = html_string.to_html()
-    title = extract_title(contents)
-    modified_template = template_contents
-    modified_template = modified_template.replace('{{ Title }}', title)
-    modified_template = modified_template.replace('{{ Content }}', html)
-    modified_template = modified_template.replace('href="/', f'href="{basepath}')
-    modified_template = modified_template.replace('src="/', f'src="{basepath}')
-    with open(dest_path, "w", encoding="utf-8") as f:
-        f.write(modified_template)
-
-
-def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, basepath):
-    dir_contents = os.listdir(dir_path_content)
-    with open(template_path, "r", encoding="utf-8") as f:
-        template_contents = f.read()
-    for filename in dir_contents:
-        full_path = os.path.join(dir_path_content, filename)
-
-        if os.path.isdir(full_path):
-            new_dest_dir = os.path.join(dest_dir_path, filename)
-            os.makedirs(new_dest_dir, exist_ok=True)
-
-            generate_pages_recursive(full_path, template_path, new_dest_dir, basepath)
-        elif filename.endswith(".md"):
-            with open(full_path, "r", encoding="utf-8") as f:
-                contents = f.read()
-                html_string = markdown_to_html_node(contents)
-                html = html_string.to_html()
-                title = extract_title(contents)
-
-                modified_template = template_contents
-                modified_template = modified_template.replace('{{ Title }}', title)
-                modified_template = modified_template.replace('{{ Content }}', html)
-                modified_template = modified_template.replace('href="/', f'href="{basepath}')
-                modified_template = modified_template.replace('src="/', f'src="{basepath}')
-                output_filename = filename.replace(".md", ".html")
-                output_path = os.path.join(dest_dir_path, output_filename)
-                with open(output_path, "w", encoding="utf-8") as f:
-                    f.write(modified_template)
+
+def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, basepath, manifest=None, jobs=1,
+                             profiler=NULL_PROFILER, ast_cache=None, stream_threshold=STREAM_THRESHOLD,
+                             explain=False, site_url=None, io_threads=DEFAULT_IO_THREADS, minify=False,
+                             images=None, static_dir='static', drafts=False):
+    # template_path is the default template, see find_template for sections.
+    # images is what process_images returned for static_dir, when the pages
+    # should show image sizes and variants. Pages with "draft: true" in their
+    # front matter are left out, and their outputs removed, unless drafts.
+    # source path -> the error reading its front matter for the draft check,
+    # the page is kept and reported as failed with the rest
+    unparsed = {}
+    with profiler.stage('collect'):
+        scanned = scan_pages(dir_path_content, dest_dir_path)
+        if not drafts:
+            # drafts built by a --drafts build are in the manifest too
+            built = manifest['pages'] if manifest is not None and not manifest.get('drafts') else None
+            kept = []
+            for page in scanned:
+                source_path, _, size, mtime_ns = page
+                try:
+                    if is_draft(source_path, size, mtime_ns, built):
+                        continue
+                except Exception as e:
+                    unparsed[source_path] = f"{type(e).__name__}: {e}"
+                kept.append(page)
+            scanned = kept
+    pages = [(source_path, output_path) for source_path, output_path, _, _ in scanned]
+    hits, misses = INLINE_CACHE.hits, INLINE_CACHE.misses
+    graph = None
+    index = {}
+    listing_state = {}
+    if manifest is not None:
+        update_inputs(manifest, basepath, minify, images is not None)
+        manifest['drafts'] = drafts
+        graph = DependencyGraph(manifest, (source_path for source_path, _ in pages))
+        index = manifest['index']
+        listing_state = manifest['listings']
+
+    def read_source(page):
+        # runs on the I/O threads, so the next sources are already being read
+        # while this one is checked. A file that can not be read or decoded is
+        # given back as the error, so only that page fails.
+        source_path, _, size, mtime_ns = page
+        if source_path in unparsed:
+            return None, None, unparsed[source_path]
+        with profiler.stage('read', source_path):
+            try:
+                if graph is None:
+                    return (None if size > stream_threshold else read_text(source_path)), None, None
+                source_hash = graph.stat_hash(source_path, size, mtime_ns)
+                if source_hash is not None:
+                    # same size and mtime as last time, only read if it has to be rebuilt anyway
+                    return None, source_hash, None
+                if size > stream_threshold:
+                    return None, hash_file(source_path), None
+                contents = read_text(source_path)
+                return contents, hash_string(contents), None
+            except (OSError, UnicodeDecodeError) as e:
+                return None, None, f"{type(e).__name__}: {e}"
+
+    def fail(source_path, error):
+        logger.error(f"Failed to generate {source_path}: {error}")
+        failures.append(source_path)
+        index.pop(source_path, None)
+
+    failures = []
+    inputs = {}
+    # output path -> hash of what it was last written with
+    known = {}
+
+    def plan(readers):
+        # yields the pages to render as their sources come in, the next ones
+        # are read while these render
+        depth = max(1, io_threads) * 4
+        for (source_path, output_path, size, mtime_ns), (contents, source_hash, error) in \
+                read_ahead(readers, read_source, scanned, depth):
+            if error is not None:
+                fail(source_path, error)
+                continue
+            # the template named in the front matter, an unread source is
+            # unchanged so it names the one it named last time
+            try:
+                if contents is not None:
+                    template_name = front_matter(contents).get('template')
+                elif graph is not None and source_hash == graph.stat_hash(source_path, size, mtime_ns):
+                    template_name = graph.template_name(source_path)
+                else:
+                    template_name = read_front_matter(source_path).get('template')
+            except Exception as e:
+                fail(source_path, f"{type(e).__name__}: {e}")
+                continue
+            page_template = find_template(source_path, dir_path_content, template_path, template_name)
+            if graph is not None:
+                try:
+                    deps = graph.dependencies(load_template(page_template, basepath).files)
+                except Exception:
+                    # reported by write_pages when the page is rendered
+                    deps = {page_template: None}
+                # the images it showed last time, a changed source is rebuilt
+                # anyway and its new targets are collected as it renders
+                image_files = image_deps(graph.targets(source_path), images, static_dir) if images is not None else {}
+                reasons = graph.reasons(source_path, source_hash, output_path, {**deps, **image_files})
+                if not reasons:
+                    logger.debug(f"Skipping unchanged page {source_path}")
+                    continue
+                if explain:
+                    print(f"{source_path}: {', '.join(reasons)}")
+                if contents is None and size <= stream_threshold:
+                    try:
+                        contents = read_text(source_path)
+                    except (OSError, UnicodeDecodeError) as e:
+                        fail(source_path, f"{type(e).__name__}: {e}")
+                        continue
+                # links are not scanned in streamed pages, they are never read whole
+                links = page_links(contents, dir_path_content) if contents is not None else []
+                inputs[source_path] = (deps, links, size, mtime_ns, template_name)
+                known[output_path] = graph.output_hash(source_path, output_path)
+            yield source_path, output_path, source_hash, contents, page_template
+
+    generated = 0
+    with ThreadPoolExecutor(max_workers=max(1, io_threads), thread_name_prefix='reader') as readers:
+        # the targets are only kept for the manifest, and to find the images
+        results = write_pages(plan(readers), basepath, jobs, profiler, ast_cache, io_threads, minify, images, known,
+                              collect=graph is not None)
+        for (source_path, output_path, source_hash, contents, _), error, output_hash, targets in results:
+            known.pop(output_path, None)
+            if error is not None:
+                fail(source_path, error)
+                continue
+            if graph is not None:
+                deps, links, size, mtime_ns, template_name = inputs.pop(source_path)
+                # streamed pages are never parsed whole, so none are collected
+                targets = targets or []
+                if images is not None:
+                    deps.update(image_deps(targets, images, static_dir))
+                graph.record(source_path, source_hash, output_path, deps, links, size, mtime_ns, targets,
+                             template_name, output_hash)
+            # unchanged pages keep their entry from the last build, so the
+            # listings never need every page to be read again
+            try:
+                meta, title = page_metadata(source_path, contents)
+            except Exception as e:
+                fail(source_path, f"{type(e).__name__}: {e}")
+                continue
+            index[source_path] = index_entry(source_path, output_path, dir_path_content, dest_dir_path, meta, title)
+            generated += 1
+
+    seen = {source_path for source_path, _ in pages}
+    for source_path in list(index):
+        if source_path not in seen:
+            del index[source_path]
+    if manifest is not None:
+        for output_path in prune_pages(manifest, seen, dest_dir_path):
+            logger.info(f"Removed stale page {output_path}")
+    logger.info(f"Generated {generated} page(s), {len(pages) - generated - len(failures)} unchanged")
+    hits, misses = INLINE_CACHE.hits - hits, INLINE_CACHE.misses - misses
+    if hits or misses:
+        logger.info(f"Inline cache: {hits} hits, {misses} misses")
+    with profiler.stage('listings'):
+        _, listing_failures = write_listings(index, listing_state, dir_path_content, template_path, dest_dir_path,
+                                             basepath, site_url, minify=minify)
+    failures.extend(listing_failures)
+    if ast_cache is not None:
+        ast_cache.evict()
+    return failures
@@ -0,0 +1,60 @@
+import hashlib
+
+from lru import LRUCache
+
+# only the package itself is imported up front, the lexer and formatter
+# modules cost far more and are imported when a fence first names a language
+try:
+    import pygments
+except ImportError:
+    pygments = None
+
+# part of the AST cache key, trees highlighted by another version, or not
+# highlighted at all, are not reused
+HIGHLIGHTER_VERSION = pygments.__version__ if pygments is not None else None
+# blocks longer than this are left plain, lexing them would cost more than
+# the rest of the page
+HIGHLIGHT_MAX_CHARS = 64 * 1024
+
+# (language, code hash) -> highlighted HTML, shared by every page in this process
+HIGHLIGHT_CACHE = LRUCache(1024)
+# language -> lexer, or None for languages Pygments does not know. Importing a
+# lexer module is slow, so each is only looked up when first used.
+_lexers = {}
+_formatter = None
+
+
+def fence_language(opening):
+    # the first word of the info string after the opening fence, ```python3 x -> python3
+    words = opening.lstrip('`').split()
+    return words[0].lower() if words else None
+
+
+def get_lexer(language):
+    if language not in _lexers:
+        from pygments.lexers import get_lexer_by_name
+        from pygments.util import ClassNotFound
+        try:
+            _lexers[language] = get_lexer_by_name(language, stripnl=False, ensurenl=True)
+        except ClassNotFound:
+            _lexers[language] = None
+    return _lexers[language]
+
+
+def highlight_code(code, language):
+    # the code as Pygments token spans, or None when it can not be highlighted
+    if pygments is None or not language or len(code) > HIGHLIGHT_MAX_CHARS:
+        return None
+    key = (language, hashlib.sha1(code.encode("utf-8")).digest())
+    html = HIGHLIGHT_CACHE.get(key)
+    if html is None:
+        lexer = get_lexer(language)
+        if lexer is None:
+            return None
+        global _formatter
+        if _formatter is None:
+            from pygments.formatters import HtmlFormatter
+            _formatter = HtmlFormatter(nowrap=True)
+        html = pygments.highlight(code, lexer, _formatter)
+        HIGHLIGHT_CACHE.put(key, html)
+    return html
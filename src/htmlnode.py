@@ -1,5 +1,14 @@
+import sys
+
+
 class HTMLNode:
+    # big pages create hundreds of thousands of nodes, so no per-instance __dict__
+    __slots__ = ('tag', 'value', 'children', 'props')
+
     def __init__(self, tag=None, value=None, children=None, props=None):
+        if type(tag) is str:
+            # dynamic tags like f"h{level}" would otherwise be a new string per node
+            tag = sys.intern(tag)
         self.tag = tag
         self.value = value
         self.children = children
@@ -8,6 +17,12 @@ class HTMLNode:
     def to_html(self):
         raise NotImplementedError
 
+    def iter_html(self):
+        yield self.to_html()
+
+    def write_html(self, fp):
+        fp.writelines(self.iter_html())
+
     def props_to_html(self):
         if not self.props:
             return ""
@@ -29,6 +44,8 @@ class HTMLNode:
 
 
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, value, children=None, props=None):
         super().__init__(tag=tag, value=value, props=props)
         if children is not None:
@@ -45,7 +62,19 @@ class LeafNode(HTMLNode):
         return f"<{self.tag}>{self.value}</{self.tag}>"
 
 
+class FragmentNode(LeafNode):
+    # inline HTML rendered ahead of time, with the hrefs and srcs of the links
+    # and images in it, which can no longer be found in the tree
+    __slots__ = ('targets',)
+
+    def __init__(self, value, targets=()):
+        super().__init__(tag=None, value=value)
+        self.targets = tuple(targets)
+
+
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, children, props=None):
         super().__init__(tag=tag, children=children, props=props)
         if tag is None:
@@ -57,13 +86,30 @@ class ParentNode(HTMLNode):
                 raise ValueError('ParentNode cannot have a NoneType child')
 
     def to_html(self):
-        if not self.children:
-            return f"<{self.tag}></{self.tag}>"
-        html = ''
-        for child in self.children:
-            html += child.to_html()
+        return ''.join(self.iter_html())
 
+    def iter_html(self):
+        if not self.children:
+            yield f"<{self.tag}></{self.tag}>"
+            return
         props_string = self.props_to_string()
         if props_string:
-            return f"<{self.tag} {props_string}>{html or self.value}</{self.tag}>"
-        return f"<{self.tag}>{html or self.value}</{self.tag}>"
+            yield f"<{self.tag} {props_string}>"
+        else:
+            yield f"<{self.tag}>"
+        empty = True
+        for child in self.children:
+            if isinstance(child, ParentNode):
+                for chunk in child.iter_html():
+                    if chunk:
+                        empty = False
+                    yield chunk
+            else:
+                chunk = child.to_html()
+                if chunk:
+                    empty = False
+                yield chunk
+        if empty:
+            # matches the old `html or self.value` fallback
+            yield f"{self.value}"
+        yield f"</{self.tag}>"
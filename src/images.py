@@ -0,0 +1,228 @@
+import logging
+import os
+import re
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+from manifest import hash_file, hash_string, remove_empty_dirs
+from walk import iter_tree
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+IMAGE_SUFFIXES = ('.png', '.jpg', '.jpeg', '.gif', '.webp')
+# widths of the resized WebP copies, only those narrower than the image are made
+VARIANT_WIDTHS = (480, 960, 1440)
+WEBP_QUALITY = 80
+# the src attribute exactly as text_node_to_html_node writes it
+IMG_TAG_PATTERN = re.compile(r'<img src="([^"]*)"')
+# JPEG start of frame markers, the ones that carry the image size
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def image_size(path):
+    # (width, height) from the file header alone, for PNG, GIF, JPEG and
+    # WebP. Raises an Exception for anything else.
+    with open(path, "rb") as f:
+        head = f.read(32)
+        if head[:8] == b'\x89PNG\r\n\x1a\n' and head[12:16] == b'IHDR':
+            return struct.unpack('>II', head[16:24])
+        if head[:6] in (b'GIF87a', b'GIF89a'):
+            return struct.unpack('<HH', head[6:10])
+        if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+            return _webp_size(head)
+        if head[:2] == b'\xff\xd8':
+            f.seek(2)
+            return _jpeg_size(f)
+    raise Exception(f"unknown image format: {path}")
+
+
+def _webp_size(head):
+    chunk = head[12:16]
+    if chunk == b'VP8 ':
+        width, height = struct.unpack('<HH', head[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b'VP8L':
+        bits = struct.unpack('<I', head[21:25])[0]
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b'VP8X':
+        return int.from_bytes(head[24:27], 'little') + 1, int.from_bytes(head[27:30], 'little') + 1
+    raise Exception("unknown WebP chunk")
+
+
+def _jpeg_size(f):
+    # walks the segments up to the first start of frame, skipping the
+    # EXIF and other metadata segments without reading them
+    while True:
+        byte = f.read(1)
+        if not byte:
+            raise Exception("no JPEG frame found")
+        if byte != b'\xff':
+            continue
+        marker = f.read(1)
+        while marker == b'\xff':
+            marker = f.read(1)
+        if not marker:
+            raise Exception("no JPEG frame found")
+        marker = marker[0]
+        # standalone markers have no length
+        if marker == 0x01 or 0xD0 <= marker <= 0xD9:
+            continue
+        length = struct.unpack('>H', f.read(2))[0]
+        if marker in JPEG_SOF_MARKERS:
+            height, width = struct.unpack('>xHH', f.read(5))
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def variant_path(rel_path, width):
+    # images/tom.png -> images/tom.png-480w.webp, the source extension stays
+    # so images/tom.jpg gets a variant of its own
+    return f"{rel_path}-{width}w.webp"
+
+
+def process_image(job):
+    # Reads the size of one image and, when Pillow is installed, writes its
+    # resized WebP copies. Runs in the worker processes, so failures come back
+    # as values. Returns (info, error).
+    src_path, dest_dir, rel_path = job
+    try:
+        width, height = image_size(src_path)
+        variants = []
+        if Image is not None:
+            widths = [w for w in VARIANT_WIDTHS if w < width]
+            if widths:
+                with Image.open(src_path) as image:
+                    for variant_width in widths:
+                        variant_height = max(1, round(height * variant_width / width))
+                        out_rel = variant_path(rel_path, variant_width)
+                        out_path = os.path.join(dest_dir, out_rel)
+                        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+                        resized = image.resize((variant_width, variant_height), Image.LANCZOS)
+                        resized.save(f"{out_path}.tmp", 'WEBP', quality=WEBP_QUALITY)
+                        os.replace(f"{out_path}.tmp", out_path)
+                        variants.append([out_rel, variant_width])
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+    return {'width': width, 'height': height, 'variants': variants}, None
+
+
+def _is_current(entry, dest_dir, rel_path):
+    # the variants written last time are still there, and were made and named
+    # the way this build would make them
+    if entry.get('pillow') != (Image is not None):
+        return False
+    return all(rel == variant_path(rel_path, width) and os.path.exists(os.path.join(dest_dir, rel))
+               for rel, width in entry['variants'])
+
+
+def process_images(static_dir, dest_dir, previous, jobs=1):
+    # Gets the size, and the WebP variants, of every image under static_dir.
+    # previous is what the last build returned, images whose size and mtime or
+    # hash match it are not processed again. Variants of images that are gone
+    # are removed. Returns (entries for the next build, failed paths).
+    entries = {}
+    to_process = []
+    for rel_path, stat in iter_tree(static_dir):
+        if not rel_path.lower().endswith(IMAGE_SUFFIXES):
+            continue
+        src_path = os.path.join(static_dir, rel_path)
+        entry = previous.get(rel_path)
+        if entry is not None and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+            digest = entry['hash']
+        else:
+            digest = hash_file(src_path)
+        if entry is not None and entry['hash'] == digest and _is_current(entry, dest_dir, rel_path):
+            entries[rel_path] = dict(entry, size=stat.st_size, mtime=stat.st_mtime_ns)
+            continue
+        entries[rel_path] = {'hash': digest, 'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+        to_process.append((src_path, dest_dir, rel_path))
+
+    executor = None
+    if jobs <= 1 or len(to_process) <= 1:
+        results = map(process_image, to_process)
+    else:
+        executor = ProcessPoolExecutor(max_workers=jobs)
+        results = executor.map(process_image, to_process)
+    failures = []
+    try:
+        for (src_path, _, rel_path), (info, error) in zip(to_process, results):
+            if error is not None:
+                logger.error(f"Failed to process {src_path}: {error}")
+                failures.append(src_path)
+                del entries[rel_path]
+                continue
+            entries[rel_path].update(info, pillow=Image is not None)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    kept = {rel for entry in entries.values() for rel, _ in entry['variants']}
+    for entry in previous.values():
+        for rel, _ in entry['variants']:
+            path = os.path.join(dest_dir, rel)
+            if rel not in kept and os.path.exists(path):
+                os.remove(path)
+                remove_empty_dirs(os.path.dirname(path), dest_dir)
+    logger.info(f"Processed {len(to_process) - len(failures)} image(s), "
+                f"{len(entries) - len(to_process) + len(failures)} unchanged")
+    return entries, failures
+
+
+def image_attributes(entry, src, basepath):
+    # what goes after src in an <img> showing the image, the image itself is
+    # the widest candidate of the srcset
+    width = entry['width']
+    attrs = f' width="{width}" height="{entry["height"]}"'
+    if entry['variants']:
+        candidates = [f"{basepath}{rel.replace(os.sep, '/')} {variant_width}w"
+                      for rel, variant_width in entry['variants']]
+        candidates.append(f"{src} {width}w")
+        attrs += f' srcset="{", ".join(candidates)}" sizes="(max-width: {width}px) 100vw, {width}px"'
+    return attrs
+
+
+def image_rel_path(url):
+    # the path under static/ of a root relative src, None for any other src
+    if not url.startswith('/'):
+        return None
+    return url.split('#', 1)[0].split('?', 1)[0][1:].replace('/', os.sep)
+
+
+def page_images(targets, entries, basepath):
+    # {src as written in the page's HTML: attributes} for the images a page
+    # shows, for add_image_attributes
+    images = {}
+    for url in targets:
+        entry = entries.get(image_rel_path(url))
+        if entry is not None:
+            src = basepath + url[1:]
+            images[src] = image_attributes(entry, src, basepath)
+    return images
+
+
+def image_deps(targets, entries, static_dir):
+    # the images a page shows, mapped to a digest of the attributes they add,
+    # so the page is rebuilt when they change
+    deps = {}
+    for url in targets:
+        rel_path = image_rel_path(url)
+        if rel_path in entries:
+            deps[os.path.join(static_dir, rel_path)] = hash_string(image_attributes(entries[rel_path], url, '/'))
+    return deps
+
+
+def add_image_attributes(html, images):
+    # adds the size and srcset to every <img> whose src is in images
+    if not images or '<img ' not in html:
+        return html
+
+    def add(match):
+        attrs = images.get(match.group(1))
+        return match.group(0) if attrs is None else match.group(0) + attrs
+
+    return IMG_TAG_PATTERN.sub(add, html)
@@ -0,0 +1,90 @@
+import logging
+import os
+import posixpath
+import re
+
+from htmlnode import FragmentNode
+from listings import page_url
+
+logger = logging.getLogger(__name__)
+
+# http:, mailto:, data: and the like point outside the site
+SCHEME_PATTERN = re.compile(r"[a-zA-Z][a-zA-Z0-9+.-]*:")
+
+
+def node_targets(node):
+    # every link href and image src in the HTML tree of a page, in order and
+    # without repeats. They come from the tree the page is rendered from, so
+    # code is never mistaken for a link and the markdown is not scanned again.
+    targets = {}
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, FragmentNode):
+            targets.update(dict.fromkeys(node.targets))
+        elif node.props:
+            if node.tag == 'a' and 'href' in node.props:
+                targets[node.props['href']] = None
+            elif node.tag == 'img' and 'src' in node.props:
+                targets[node.props['src']] = None
+        if node.children:
+            stack.extend(reversed(node.children))
+    return list(targets)
+
+
+def is_internal(url):
+    return bool(url) and not url.startswith(('#', '//')) and SCHEME_PATTERN.match(url) is None
+
+
+def url_key(path):
+    # /blog/tom, /blog/tom/, /blog/tom/index.html and /blog/tom.html are all
+    # served by the same output, so they share one key
+    path = path.rstrip('/')
+    if path.endswith('/index.html') or path == 'index.html':
+        path = path[:-len('index.html')].rstrip('/')
+    elif path.endswith('.html'):
+        path = path[:-len('.html')]
+    return path
+
+
+def resolve_url(url, base_url):
+    # the site path a link on the page at base_url points at
+    path = url.split('#', 1)[0].split('?', 1)[0]
+    if not path:
+        return base_url
+    if not path.startswith('/'):
+        path = posixpath.join(posixpath.dirname(base_url.rstrip('/') + '/'), path)
+    resolved = posixpath.normpath(path)
+    return resolved + '/' if path.endswith('/') and resolved != '/' else resolved
+
+
+def build_path_index(outputs, dest_dir):
+    # one set of url keys for every file the build wrote, so each link is
+    # checked with a single lookup
+    return {url_key('/' + os.path.relpath(output_path, dest_dir).replace(os.sep, '/')) for output_path in outputs}
+
+
+def site_outputs(manifest, dest_dir):
+    # the pages, listings and static files of the last build, from the
+    # manifest alone
+    yield from (entry['output'] for entry in manifest['pages'].values())
+    yield from manifest['listings']
+    for rel_path in manifest['static']:
+        yield os.path.join(dest_dir, rel_path)
+
+
+def check_links(manifest, dest_dir):
+    # Checks the internal links of every page against the outputs of the
+    # build. The targets of each page are recorded in the manifest when it is
+    # rendered, so unchanged pages are checked again, in case what they link
+    # to is gone, without being read. Returns {source path: [broken urls]}.
+    index = build_path_index(site_outputs(manifest, dest_dir), dest_dir)
+    broken = {}
+    for source_path, entry in sorted(manifest['pages'].items()):
+        base_url = page_url(entry['output'], dest_dir)
+        for url in entry.get('targets', ()):
+            if is_internal(url) and url_key(resolve_url(url, base_url)) not in index:
+                broken.setdefault(source_path, []).append(url)
+    for source_path, urls in broken.items():
+        logger.warning(f"Broken link(s) in {source_path}: {', '.join(urls)}")
+    return broken
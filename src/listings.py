@@ -0,0 +1,157 @@
+import html
+import logging
+import os
+
+from frontmatter import meta_list
+from manifest import hash_string, remove_empty_dirs
+from postprocess import minify_html
+from template import find_template, load_template
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 10
+TAGS_DIR = 'tags'
+SITEMAP = 'sitemap.xml'
+
+
+def page_url(output_path, dest_dir):
+    url = '/' + os.path.relpath(output_path, dest_dir).replace(os.sep, '/')
+    if url.endswith('/index.html'):
+        url = url[:-len('index.html')]
+    return url
+
+
+def index_entry(source_path, output_path, content_dir, dest_dir, meta, title):
+    # what the listings and the sitemap need to know about one page, title is
+    # the one page_metadata found, the same {{ Title }} shows
+    rel_path = os.path.relpath(source_path, content_dir)
+    return {
+        'title': title,
+        'url': page_url(output_path, dest_dir),
+        'section': rel_path.split(os.sep, 1)[0] if os.sep in rel_path else None,
+        # a YAML or TOML date can be a number, it is sorted and shown as text
+        'date': str(meta['date']) if meta.get('date') is not None else None,
+        'tags': meta_list(meta, 'tags'),
+    }
+
+
+def tag_slug(tag):
+    return '-'.join(tag.lower().split())
+
+
+def plan_listings(index, content_dir, dest_dir, page_size=PAGE_SIZE):
+    # One pass over the index groups the pages by section and tag, so each
+    # listing only ever looks at its own pages. Sections list the pages that
+    # have a date, newest first. Returns (output path, source path used to pick
+    # the template, title, entries, page number, urls of every page).
+    owned = {entry['url'] for entry in index.values()}
+    sections = {}
+    tags = {}
+    for entry in index.values():
+        if entry['section'] is not None and entry['date']:
+            sections.setdefault(entry['section'], []).append(entry)
+        for tag in entry['tags']:
+            tags.setdefault(tag, []).append(entry)
+
+    listings = []
+    for section, entries in sorted(sections.items()):
+        base_url = f"/{section}/"
+        # a section with its own index page gets its listing one level down
+        first_url = f"{base_url}page/1/" if base_url in owned else base_url
+        template_source = os.path.join(content_dir, section, 'index.md')
+        listings.extend(_paginate(entries, dest_dir, base_url, first_url, template_source, section.capitalize(),
+                                  page_size))
+    for tag, entries in sorted(tags.items()):
+        base_url = f"/{TAGS_DIR}/{tag_slug(tag)}/"
+        listings.extend(_paginate(entries, dest_dir, base_url, base_url, None, f"Tagged {tag}", page_size))
+    return listings
+
+
+def _paginate(entries, dest_dir, base_url, first_url, template_source, title, page_size):
+    entries = sorted(entries, key=lambda entry: (entry['date'] or '', entry['title']), reverse=True)
+    count = max(1, -(-len(entries) // page_size))
+    urls = [first_url] + [f"{base_url}page/{number}/" for number in range(2, count + 1)]
+    pages = []
+    for number, url in enumerate(urls, 1):
+        output_path = os.path.join(dest_dir, *url.strip('/').split('/'), 'index.html')
+        chunk = entries[(number - 1) * page_size:number * page_size]
+        pages.append((output_path, template_source, title, chunk, number, urls))
+    return pages
+
+
+def listing_html(title, entries, number, urls):
+    parts = [f"<div><h1>{html.escape(title)}</h1><ul>"]
+    for entry in entries:
+        date = f" <time>{html.escape(entry['date'])}</time>" if entry['date'] else ''
+        parts.append(f'<li><a href="{html.escape(entry["url"])}">{html.escape(entry["title"])}</a>{date}</li>')
+    parts.append("</ul>")
+    if len(urls) > 1:
+        parts.append("<nav>")
+        if number > 1:
+            parts.append(f'<a href="{urls[number - 2]}">Newer</a>')
+        if number < len(urls):
+            parts.append(f'<a href="{urls[number]}">Older</a>')
+        parts.append("</nav>")
+    parts.append("</div>")
+    return ''.join(parts)
+
+
+def sitemap_xml(urls, site_url, basepath):
+    root = site_url.rstrip('/') + basepath.rstrip('/')
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+    for url, date in urls:
+        lastmod = f"<lastmod>{html.escape(date)}</lastmod>" if date else ''
+        lines.append(f"  <url><loc>{html.escape(root + url)}</loc>{lastmod}</url>")
+    lines.append('</urlset>')
+    return '\n'.join(lines) + '\n'
+
+
+def write_listings(index, state, content_dir, template_path, dest_dir, basepath, site_url=None,
+                   page_size=PAGE_SIZE, minify=False):
+    # Writes the section and tag listings and the sitemap from the page index.
+    # state maps every generated file to the hash of what was written there
+    # last time, so unchanged listings are not written again and listings that
+    # are gone get removed. Returns (written paths, failed paths).
+    outputs = {}
+    written = []
+    failures = []
+    sitemap_urls = sorted((entry['url'], entry['date']) for entry in index.values())
+    for output_path, template_source, title, entries, number, urls in \
+            plan_listings(index, content_dir, dest_dir, page_size):
+        try:
+            if template_source is None:
+                listing_template = template_path
+            else:
+                listing_template = find_template(template_source, content_dir, template_path)
+            template = load_template(listing_template, basepath)
+            html = template.render({'Title': title, 'Content': listing_html(title, entries, number, urls)})
+            outputs[output_path] = minify_html(html) if minify else html
+        except Exception as e:
+            logger.error(f"Failed to generate {output_path}: {type(e).__name__}: {e}")
+            failures.append(output_path)
+            continue
+        sitemap_urls.append((urls[number - 1], None))
+    if site_url:
+        outputs[os.path.join(dest_dir, SITEMAP)] = sitemap_xml(sitemap_urls, site_url, basepath)
+
+    for output_path, contents in outputs.items():
+        digest = hash_string(contents)
+        if state.get(output_path) == digest and os.path.exists(output_path):
+            continue
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        tmp_path = f"{output_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(contents)
+        os.replace(tmp_path, output_path)
+        state[output_path] = digest
+        written.append(output_path)
+    for output_path in list(state):
+        if output_path not in outputs and output_path not in failures:
+            del state[output_path]
+            if os.path.exists(output_path):
+                os.remove(output_path)
+                remove_empty_dirs(os.path.dirname(output_path), dest_dir)
+    if written:
+        logger.info(f"Wrote {len(written)} listing page(s)")
+    return written, failures
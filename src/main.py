@@ -1,26 +1,109 @@
 import os
 import sys
-import shutil
+import argparse
+import logging
 
-from helper import generate_page, copy_static_files, generate_pages_recursive
+from cache import ASTCache, DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES
+from images import Image
+from postprocess import brotli
+from profiler import NULL_PROFILER, Profiler
+from website import MANIFEST_PATH, Site
+from writer import DEFAULT_IO_THREADS
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Build the static site from content/ into docs/.')
+    parser.add_argument('basepath', nargs='?', default='/')
+    parser.add_argument('--incremental', action='store_true',
+                        help=f'only rebuild pages whose inputs changed since the last build (tracked in {MANIFEST_PATH})')
+    parser.add_argument('--explain', action='store_true',
+                        help='print why each rebuilt page was rebuilt (new page, source or template changed, ...)')
+    parser.add_argument('--site-url', metavar='URL',
+                        help='also write sitemap.xml with page URLs under this origin, e.g. https://example.com')
+    parser.add_argument('--drafts', action='store_true',
+                        help='also build pages with "draft: true" in their front matter')
+    parser.add_argument('--strict-links', action='store_true',
+                        help='fail the build when a page links to a path the build did not write')
+    parser.add_argument('--clean', action='store_true',
+                        help='delete the output directory before building')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='render pages in N worker processes (0 uses every CPU)')
+    parser.add_argument('--io-threads', type=int, default=DEFAULT_IO_THREADS, metavar='N',
+                        help='read sources and write outputs on N threads while pages render')
+    parser.add_argument('--hash-static', action='store_true',
+                        help='compare static files by content hash instead of size and mtime')
+    parser.add_argument('--link-static', action='store_true',
+                        help='hardlink static files into the output instead of copying them')
+    parser.add_argument('--minify', action='store_true',
+                        help='minify the generated HTML and the static CSS, leaving pre and code blocks alone')
+    parser.add_argument('--images', action='store_true',
+                        help='add width, height and a srcset of resized WebP copies (needs Pillow) to every image')
+    parser.add_argument('--compress', action='store_true',
+                        help='write precompressed .gz siblings of text outputs, and .br ones when brotli is installed')
+    parser.add_argument('--no-cache', action='store_true', help='parse every page instead of using the AST cache')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='where parsed pages are cached')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024), metavar='MB',
+                        help='evict the least recently used cache entries above this size')
+    parser.add_argument('-v', '--verbose', action='store_true', help='log every page and copied file')
+    parser.add_argument('-q', '--quiet', action='store_true', help='only log warnings and errors')
+    parser.add_argument('--profile', action='store_true',
+                        help='time every build stage per page and print a report at the end')
+    parser.add_argument('--profile-top', type=int, default=10, metavar='N',
+                        help='number of slowest pages to list in the profile report')
+    parser.add_argument('--trace', metavar='FILE', help='with --profile, also write a Chrome trace JSON file')
+    args = parser.parse_args(argv)
+    if args.jobs < 0:
+        parser.error('--jobs must be 0 or greater')
+    if args.jobs == 0:
+        args.jobs = os.cpu_count() or 1
+    return args
+
+
+def configure_logging(verbose=False, quiet=False):
+    level = logging.DEBUG if verbose else logging.WARNING if quiet else logging.INFO
+    logging.basicConfig(level=level, format='%(message)s')
 
 
 def main():
-    if len(sys.argv) > 1:
-        basepath = sys.argv[1]
-    else:
-        basepath = '/'
+    if sys.argv[1:2] == ['serve']:
+        from serve import main as serve_main
+        configure_logging()
+        serve_main(sys.argv[2:])
+        return
 
+    args = parse_args(sys.argv[1:])
+    configure_logging(args.verbose, args.quiet)
+    profiler = Profiler() if args.profile else NULL_PROFILER
+    ast_cache = None if args.no_cache else ASTCache(args.cache_dir, args.cache_size * 1024 * 1024)
 
+    site = Site('content', 'static', 'docs', 'template.html', args.basepath, MANIFEST_PATH, ast_cache=ast_cache,
+                minify=args.minify, site_url=args.site_url, images=args.images,
+                drafts=args.drafts)
+    if args.compress and brotli is None:
+        logging.debug("brotli is not installed, writing .gz files only")
+    if args.images and Image is None:
+        logging.debug("Pillow is not installed, adding image sizes only")
+    copy_failures, failures, compress_failures = site.build(
+        incremental=args.incremental, clean=args.clean, jobs=args.jobs, profiler=profiler, explain=args.explain,
+        hash_static=args.hash_static, link_static=args.link_static, io_threads=args.io_threads,
+        compress=args.compress)
 
-    src = 'static'
-    dst = 'docs'
-    template_path = 'template.html'
-    shutil.rmtree(dst, ignore_errors=True)
-    copy_static_files(src, dst)
+    if args.profile:
+        print(profiler.report(args.profile_top))
+        if args.trace:
+            profiler.write_trace(args.trace)
+            logging.info(f"Wrote trace to {args.trace}")
 
-    generate_pages_recursive('content', template_path, dst, basepath)
-    # generate_page('content/index.md', template_path, os.path.join(dst, 'index.html'), basepath)
+    if copy_failures:
+        logging.error(f"{len(copy_failures)} static file(s) failed to copy or process")
+    if failures:
+        logging.error(f"{len(failures)} page(s) failed to generate")
+    if compress_failures:
+        logging.error(f"{len(compress_failures)} file(s) failed to compress")
+    if args.strict_links and site.broken_links:
+        logging.error(f"{len(site.broken_links)} page(s) have broken links")
+    if copy_failures or failures or compress_failures or (args.strict_links and site.broken_links):
+        sys.exit(1)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+
+MANIFEST_VERSION = 7
+
+
+def new_manifest():
+    # index holds the metadata of every page for the listings, listings the
+    # hash of every generated listing and sitemap file, images the size and
+    # variants of every static image
+    return {'version': MANIFEST_VERSION, 'basepath': None, 'pages': {}, 'static': [], 'index': {}, 'listings': {},
+            'images': {}}
+
+
+def load_manifest(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return new_manifest()
+    if manifest.get('version') != MANIFEST_VERSION:
+        return new_manifest()
+    return manifest
+
+
+def save_manifest(path, manifest):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def hash_string(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def hash_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def invalidate_pages(manifest):
+    for entry in manifest['pages'].values():
+        entry['hash'] = None
+
+
+def update_inputs(manifest, basepath, minify=False, images=False):
+    # a new basepath, minify or images setting changes every page, so forget
+    # the page hashes but keep the outputs around for pruning. Templates and
+    # images are tracked per page, see depgraph.
+    if (manifest['basepath'] != basepath or manifest.get('minify', False) != minify
+            or manifest.get('images_enabled', False) != images):
+        invalidate_pages(manifest)
+    manifest['basepath'] = basepath
+    manifest['minify'] = minify
+    manifest['images_enabled'] = images
+
+
+def record_page(manifest, source_path, source_hash, output_path, deps=None, links=None, targets=None):
+    # deps maps each template file the page was built with to its hash, links
+    # maps each page it links to to whether that page existed, targets lists
+    # every href and src in the page for the link check
+    manifest['pages'][source_path] = {'hash': source_hash, 'output': output_path,
+                                      'deps': deps or {}, 'links': links or {}, 'targets': targets or []}
+
+
+def prune_pages(manifest, seen, dest_dir):
+    removed = []
+    for source_path in list(manifest['pages']):
+        if source_path in seen:
+            continue
+        output_path = manifest['pages'].pop(source_path)['output']
+        if os.path.exists(output_path):
+            os.remove(output_path)
+            remove_empty_dirs(os.path.dirname(output_path), dest_dir)
+        removed.append(output_path)
+    return removed
+
+
+def remove_empty_dirs(path, stop_dir):
+    stop_dir = os.path.abspath(stop_dir)
+    path = os.path.abspath(path)
+    while path != stop_dir and path.startswith(stop_dir + os.sep):
+        try:
+            os.rmdir(path)
+        except OSError:
+            return
+        path = os.path.dirname(path)
@@ -0,0 +1,179 @@
+import gzip
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from walk import iter_tree
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+HTML_TOKEN_PATTERN = re.compile(r"(<!--.*?-->|<[^>]*>)", re.S)
+TAG_NAME_PATTERN = re.compile(r"</?([a-zA-Z][a-zA-Z0-9]*)")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+# whitespace inside these is kept exactly as written
+RAW_TAGS = frozenset(('pre', 'code', 'textarea', 'script', 'style'))
+# whitespace around these never renders, so it can go
+BLOCK_TAGS = frozenset((
+    'html', 'head', 'body', 'title', 'meta', 'link', 'base', 'script', 'style', 'article', 'aside', 'section',
+    'nav', 'header', 'footer', 'main', 'div', 'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'li', 'dl',
+    'dt', 'dd', 'blockquote', 'pre', 'hr', 'br', 'table', 'thead', 'tbody', 'tfoot', 'tr', 'th', 'td', 'figure',
+    'figcaption', 'form', 'fieldset',
+))
+CSS_TOKEN_PATTERN = re.compile(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|/\*.*?\*/)""", re.S)
+CSS_SPACE_PATTERN = re.compile(r"\s*([{};,>])\s*")
+
+COMPRESSIBLE = ('.html', '.css', '.js', '.svg', '.xml', '.txt', '.json')
+COMPRESSED = ('.gz', '.br')
+# below this a compressed copy saves less than the request headers cost
+MIN_COMPRESS_SIZE = 256
+
+
+def minify_html(html):
+    # Collapses whitespace in text to one space and drops it next to block
+    # tags, and drops comments other than conditional ones. Tags are copied
+    # untouched, and so is everything inside pre, code, textarea, script and
+    # style.
+    out = []
+    raw_depth = 0
+    strip_next = False
+    for token in HTML_TOKEN_PATTERN.split(html):
+        if not token:
+            continue
+        if token.startswith('<!--'):
+            if raw_depth or token.startswith('<!--['):
+                out.append(token)
+            continue
+        if token[0] == '<':
+            match = TAG_NAME_PATTERN.match(token)
+            name = match.group(1).lower() if match else None
+            outside = not raw_depth
+            if name in RAW_TAGS:
+                if token.startswith('</'):
+                    raw_depth = max(0, raw_depth - 1)
+                elif not token.endswith('/>'):
+                    raw_depth += 1
+            strip_next = False
+            if name in BLOCK_TAGS:
+                if outside and out and out[-1][0] != '<':
+                    out[-1] = out[-1].rstrip()
+                    if not out[-1]:
+                        out.pop()
+                strip_next = not raw_depth
+            out.append(token)
+            continue
+        if not raw_depth:
+            token = WHITESPACE_PATTERN.sub(' ', token)
+            if strip_next:
+                token = token.lstrip()
+        strip_next = False
+        if token:
+            out.append(token)
+    return ''.join(out)
+
+
+def minify_css(css):
+    # drops comments and the whitespace around braces, semicolons, commas and
+    # child combinators, strings are left alone
+    out = []
+    for token in CSS_TOKEN_PATTERN.split(css):
+        if not token or token.startswith('/*'):
+            continue
+        if token[0] in '"\'':
+            out.append(token)
+            continue
+        token = WHITESPACE_PATTERN.sub(' ', token)
+        token = CSS_SPACE_PATTERN.sub(r'\1', token)
+        out.append(token.replace(': ', ':').replace(';}', '}'))
+    return ''.join(out).strip()
+
+
+def compress_file(path, use_brotli=True, keep=()):
+    # Writes path.gz, and path.br when brotli is installed, with the mtime of
+    # path, so a sibling with a matching mtime is known to be current. Returns
+    # the siblings written, paths in keep are never overwritten.
+    stat = os.stat(path)
+    encoders = [('.gz', lambda data: gzip.compress(data, 9, mtime=0))]
+    if use_brotli and brotli is not None:
+        encoders.append(('.br', lambda data: brotli.compress(data)))
+    data = None
+    written = []
+    for suffix, encode in encoders:
+        sibling = path + suffix
+        if sibling in keep:
+            continue
+        try:
+            if os.stat(sibling).st_mtime_ns == stat.st_mtime_ns:
+                continue
+        except FileNotFoundError:
+            pass
+        if data is None:
+            with open(path, "rb") as f:
+                data = f.read()
+        tmp_path = f"{sibling}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(encode(data))
+        os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        os.replace(tmp_path, sibling)
+        written.append(sibling)
+    return written
+
+
+def is_compressed_sibling(rel_path, keep=()):
+    # keep is the files copied from static/, a precompressed asset there was
+    # not written by compress_tree even when its name looks like it
+    return rel_path.endswith(COMPRESSED) and rel_path[:-3].endswith(COMPRESSIBLE) and rel_path not in keep
+
+
+def remove_compressed(root, keep=()):
+    # removes every sibling compress_tree wrote, for builds without
+    # compression, which would otherwise leave them behind with old contents
+    keep = set(keep)
+    removed = 0
+    for rel_path, _ in iter_tree(root):
+        if is_compressed_sibling(rel_path, keep):
+            os.remove(os.path.join(root, rel_path))
+            removed += 1
+    if removed:
+        logger.info(f"Removed {removed} compressed file(s) from {root}")
+    return removed
+
+
+def compress_tree(root, jobs=None, use_brotli=True, keep=()):
+    # Precompresses every text output under root and removes siblings whose
+    # output is gone, the relative paths in keep are left alone. zlib and
+    # brotli release the GIL while they work, so a thread pool keeps every
+    # core busy. Returns the failed paths.
+    keep = set(keep)
+    kept = {os.path.join(root, rel_path) for rel_path in keep}
+    to_compress = []
+    stale = []
+    for rel_path, stat in iter_tree(root):
+        path = os.path.join(root, rel_path)
+        if is_compressed_sibling(rel_path, keep):
+            if not os.path.exists(path[:-3]):
+                stale.append(path)
+        elif rel_path.endswith(COMPRESSIBLE) and stat.st_size >= MIN_COMPRESS_SIZE:
+            to_compress.append(path)
+    for path in stale:
+        os.remove(path)
+
+    failures = []
+
+    def compress_one(path):
+        try:
+            return compress_file(path, use_brotli, kept)
+        except OSError as e:
+            logger.error(f"Failed to compress {path}: {e}")
+            failures.append(path)
+            return []
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        written = sum(len(siblings) for siblings in executor.map(compress_one, to_compress))
+    logger.info(f"Compressed {root}: {written} file(s) written, {len(stale)} stale removed")
+    return failures
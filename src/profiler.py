@@ -0,0 +1,81 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+
+class Profiler:
+    def __init__(self):
+        # (page, stage, start, seconds, pid, thread id). Reader and writer
+        # threads run their stages alongside the rest, so only wall time is
+        # recorded, memory counters are process wide and can not be split
+        # between stages running at once.
+        self.records = []
+
+    @contextmanager
+    def stage(self, name, page=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.records.append((page, name, start, seconds, os.getpid(), threading.get_ident()))
+
+    def merge(self, records):
+        self.records.extend(records)
+
+    def stage_totals(self):
+        totals = {}
+        for _, stage, _, seconds, _, _ in self.records:
+            total = totals.setdefault(stage, [0, 0.0])
+            total[0] += 1
+            total[1] += seconds
+        return totals
+
+    def page_totals(self):
+        totals = {}
+        for page, _, _, seconds, _, _ in self.records:
+            if page is not None:
+                totals[page] = totals.get(page, 0.0) + seconds
+        return totals
+
+    def report(self, top=10):
+        lines = ["Stage breakdown:"]
+        totals = self.stage_totals()
+        overall = sum(seconds for _, seconds in totals.values()) or 1.0
+        for stage, (count, seconds) in sorted(totals.items(), key=lambda item: -item[1][1]):
+            lines.append(f"  {stage:<10} {seconds * 1000:10.1f} ms {seconds / overall:6.1%} {count:7d} calls")
+        pages = sorted(self.page_totals().items(), key=lambda item: -item[1])[:top]
+        if pages:
+            lines.append(f"Slowest {len(pages)} page(s):")
+            for page, seconds in pages:
+                lines.append(f"  {seconds * 1000:10.1f} ms  {page}")
+        return '\n'.join(lines)
+
+    def write_trace(self, path):
+        # Chrome trace event format, load it in chrome://tracing or Perfetto
+        events = []
+        # one track per thread, so the reads and writes on the I/O threads
+        # do not overlap the stages of the main thread
+        for page, stage, start, seconds, pid, tid in self.records:
+            events.append({
+                'name': stage, 'cat': 'build', 'ph': 'X', 'pid': pid, 'tid': tid,
+                'ts': start * 1e6, 'dur': seconds * 1e6,
+                'args': {'page': page},
+            })
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+class NullProfiler:
+    records = ()
+
+    def stage(self, name, page=None):
+        return nullcontext()
+
+    def merge(self, records):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
@@ -0,0 +1,328 @@
+import argparse
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import threading
+import time
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+from frontmatter import front_matter
+from helper import collect_pages, generate_pages_recursive, open_output, page_metadata, write_page
+from listings import index_entry, write_listings
+from manifest import hash_string, remove_empty_dirs
+from sync import copy_file, list_files, sync_static_files
+from template import SECTION_TEMPLATE_DIR, find_template, load_template
+
+logger = logging.getLogger(__name__)
+
+# from sys/inotify.h
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE \
+    | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct("iIII")
+
+# editors save in bursts of events, wait this long for the burst to finish
+SETTLE_SECONDS = 0.02
+
+
+class PollingWatcher:
+    def __init__(self, paths, interval=0.1):
+        self.paths = paths
+        self.interval = interval
+        self.snapshot = self.scan()
+
+    def scan(self):
+        snapshot = {}
+        for path in self.paths:
+            if os.path.isdir(path):
+                for rel_path, stat in list_files(path).items():
+                    snapshot[os.path.join(path, rel_path)] = (stat.st_mtime_ns, stat.st_size)
+            elif os.path.exists(path):
+                stat = os.stat(path)
+                snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while deadline is None or time.monotonic() < deadline:
+            time.sleep(self.interval)
+            snapshot = self.scan()
+            changed = {path for path in snapshot.keys() | self.snapshot.keys()
+                       if snapshot.get(path) != self.snapshot.get(path)}
+            self.snapshot = snapshot
+            if changed:
+                return changed
+        return set()
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    def __init__(self, paths):
+        libc_name = ctypes.util.find_library("c")
+        if libc_name is None:
+            raise OSError("libc not found")
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self.libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches = {}
+        # plain files are watched through their directory, limited to these names
+        self.files = {}
+        for path in paths:
+            if os.path.isdir(path):
+                self.add_tree(path)
+            else:
+                directory = os.path.dirname(path) or '.'
+                self.files.setdefault(directory, set()).add(os.path.basename(path))
+                if directory not in self.watches.values():
+                    self.add_watch(directory)
+
+    def add_watch(self, directory):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"cannot watch {directory}")
+        self.watches[wd] = directory
+
+    def add_tree(self, root):
+        for dirpath, _, _ in os.walk(root):
+            self.add_watch(dirpath)
+
+    def read_events(self):
+        changed = set()
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            directory = self.watches.get(wd)
+            if directory is None or not name:
+                continue
+            if directory in self.files and name not in self.files[directory]:
+                continue
+            path = os.path.join(directory, name) if directory != '.' else name
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self.add_tree(path)
+                    changed.update(os.path.join(path, rel_path) for rel_path in list_files(path))
+                continue
+            changed.add(path)
+        return changed
+
+    def wait(self, timeout=None):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        changed = self.read_events()
+        while select.select([self.fd], [], [], SETTLE_SECONDS)[0]:
+            changed |= self.read_events()
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+def create_watcher(paths):
+    try:
+        return InotifyWatcher(paths)
+    except (OSError, AttributeError) as e:
+        logger.warning(f"inotify unavailable ({e}), falling back to polling")
+        return PollingWatcher(paths)
+
+
+class DevServer:
+    def __init__(self, content_dir, static_dir, template_path, dest_dir, basepath, site_url=None):
+        self.content_dir = content_dir
+        self.static_dir = static_dir
+        self.template_path = template_path
+        self.dest_dir = dest_dir
+        self.basepath = basepath
+        self.site_url = site_url
+        # source path -> (output path, hash of the last rendered contents,
+        # absolute paths of the template files it was rendered with, template
+        # named in its front matter)
+        self.pages = {}
+        # the page index and listing state write_listings keeps up to date,
+        # as in the manifest of a build
+        self.index = {}
+        self.listings = {}
+
+    def build_all(self):
+        sync_static_files(self.static_dir, self.dest_dir)
+        for source_path, output_path in collect_pages(self.content_dir, self.dest_dir):
+            self.render(source_path, output_path)
+        self.write_listings()
+
+    def write_listings(self):
+        written, _ = write_listings(self.index, self.listings, self.content_dir, self.template_path, self.dest_dir,
+                                    self.basepath, self.site_url)
+        return written
+
+    def output_path(self, source_path):
+        rel_dir, filename = os.path.split(os.path.relpath(source_path, self.content_dir))
+        return os.path.join(self.dest_dir, rel_dir, filename.replace(".md", ".html"))
+
+    def render(self, source_path, output_path):
+        try:
+            with open(source_path, "r", encoding="utf-8") as f:
+                contents = f.read()
+            source_hash = hash_string(contents)
+            previous = self.pages.get(source_path)
+            if previous is not None and previous[:2] == (output_path, source_hash) and os.path.exists(output_path):
+                return False
+            name = front_matter(contents).get('template')
+            template_path = find_template(source_path, self.content_dir, self.template_path, name)
+            template = load_template(template_path, self.basepath)
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            with open_output(output_path) as f:
+                write_page(f, contents, template)
+            meta, title = page_metadata(source_path, contents)
+        except Exception as e:
+            logger.error(f"Failed to generate {source_path}: {type(e).__name__}: {e}")
+            self.pages.pop(source_path, None)
+            self.index.pop(source_path, None)
+            return False
+        self.index[source_path] = index_entry(source_path, output_path, self.content_dir, self.dest_dir, meta, title)
+        self.pages[source_path] = (output_path, source_hash, [os.path.abspath(path) for path in template.files], name)
+        return True
+
+    def template_files(self):
+        files = {os.path.abspath(self.template_path)}
+        for _, _, template_files, _ in self.pages.values():
+            files.update(template_files)
+        return files
+
+    def remove_page(self, source_path):
+        output_path = self.pages.pop(source_path, (self.output_path(source_path),))[0]
+        self.index.pop(source_path, None)
+        if os.path.exists(output_path):
+            os.remove(output_path)
+            remove_empty_dirs(os.path.dirname(output_path), self.dest_dir)
+
+    def sync_asset(self, path):
+        dst_path = os.path.join(self.dest_dir, os.path.relpath(path, self.static_dir))
+        if os.path.isfile(path):
+            os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+            copy_file(path, dst_path)
+        elif os.path.lexists(dst_path):
+            os.remove(dst_path)
+            remove_empty_dirs(os.path.dirname(dst_path), self.dest_dir)
+
+    def rebuild(self, changed):
+        rebuilt = []
+        # only the pages rendered with a changed template or partial, or that
+        # now pick a different section template, are rendered again
+        changed_files = {os.path.abspath(path) for path in changed}
+        # which template a page picks can only change when a file under
+        # templates/ comes or goes, so only then is it looked up again
+        templates_root = os.path.abspath(os.path.join(os.path.dirname(self.template_path), SECTION_TEMPLATE_DIR))
+        recheck = any(path.startswith(templates_root + os.sep) for path in changed_files)
+        # the listings are rendered again when the index or a template changes,
+        # write_listings then only writes the ones that came out different
+        index = dict(self.index)
+        relist = recheck or bool(changed_files.intersection(self.template_files()))
+        for source_path, (output_path, source_hash, files, name) in list(self.pages.items()):
+            if changed_files.intersection(files):
+                self.pages[source_path] = (output_path, None, files, name)
+                continue
+            if not recheck:
+                continue
+            # the name kept from the last render, a page that changed since is
+            # rendered below and looks its template up again anyway
+            template_path = os.path.abspath(find_template(source_path, self.content_dir, self.template_path, name))
+            if template_path != files[0]:
+                self.pages[source_path] = (output_path, None, files, name)
+        content_root = os.path.abspath(self.content_dir) + os.sep
+        static_root = os.path.abspath(self.static_dir) + os.sep
+        for path in sorted(changed):
+            full_path = os.path.abspath(path)
+            if full_path.startswith(static_root):
+                self.sync_asset(path)
+                rebuilt.append(path)
+            elif full_path.startswith(content_root) and path.endswith(".md"):
+                if not os.path.exists(path):
+                    self.remove_page(path)
+                    rebuilt.append(path)
+                elif self.render(path, self.output_path(path)):
+                    rebuilt.append(path)
+        for source_path, (output_path, source_hash, _, _) in list(self.pages.items()):
+            if source_hash is None and self.render(source_path, output_path):
+                rebuilt.append(source_path)
+        if relist or self.index != index:
+            rebuilt.extend(self.write_listings())
+        return rebuilt
+
+    def watch(self, watcher):
+        while True:
+            changed = watcher.wait()
+            start = time.perf_counter()
+            rebuilt = self.rebuild(changed)
+            if rebuilt:
+                elapsed = (time.perf_counter() - start) * 1000
+                logger.info(f"Rebuilt {len(rebuilt)} file(s) in {elapsed:.1f} ms: {', '.join(rebuilt[:5])}")
+
+
+def make_http_server(directory, port):
+    handler = partial(SimpleHTTPRequestHandler, directory=directory)
+    httpd = ThreadingHTTPServer(("", port), handler)
+    logger.info(f"Serving {directory} at http://localhost:{port}/")
+    return httpd
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='main.py serve', description='Build the site and serve docs/.')
+    parser.add_argument('basepath', nargs='?', default='/')
+    parser.add_argument('--watch', action='store_true',
+                        help='rebuild touched pages and assets when content/, static/ or the templates change')
+    parser.add_argument('--port', type=int, default=8888)
+    parser.add_argument('--poll', action='store_true', help='poll for changes instead of using inotify')
+    parser.add_argument('--site-url', metavar='URL',
+                        help='also write sitemap.xml with page URLs under this origin, e.g. https://example.com')
+    args = parser.parse_args(argv)
+
+    server = DevServer('content', 'static', 'template.html', 'docs', args.basepath, args.site_url)
+    if not args.watch:
+        sync_static_files(server.static_dir, server.dest_dir)
+        generate_pages_recursive(server.content_dir, server.template_path, server.dest_dir, args.basepath,
+                                 site_url=args.site_url)
+        try:
+            make_http_server(server.dest_dir, args.port).serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    server.build_all()
+    httpd = make_http_server(server.dest_dir, args.port)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    paths = [server.content_dir, server.static_dir] + sorted(server.template_files())
+    if os.path.isdir(SECTION_TEMPLATE_DIR):
+        paths.append(SECTION_TEMPLATE_DIR)
+    watcher = PollingWatcher(paths) if args.poll else create_watcher(paths)
+    try:
+        server.watch(watcher)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
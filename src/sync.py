@@ -0,0 +1,128 @@
+import logging
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from manifest import hash_file, remove_empty_dirs
+from postprocess import minify_css
+from writer import write_if_changed
+from walk import iter_tree
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# from linux/fs.h
+FICLONE = 0x40049409
+
+
+def list_files(root):
+    return dict(iter_tree(root))
+
+
+def needs_copy(src_path, dst_path, src_stat, use_hash=False):
+    try:
+        dst_stat = os.stat(dst_path)
+    except FileNotFoundError:
+        return True
+    if os.path.samestat(src_stat, dst_stat):
+        return False
+    if dst_stat.st_size != src_stat.st_size:
+        return True
+    if use_hash:
+        return hash_file(src_path) != hash_file(dst_path)
+    return dst_stat.st_mtime_ns != src_stat.st_mtime_ns
+
+
+def reflink(src_path, dst_path):
+    if fcntl is None:
+        raise OSError("reflinks are not supported on this platform")
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            os.remove(dst_path)
+            raise
+    shutil.copystat(src_path, dst_path)
+
+
+def copy_file(src_path, dst_path, hardlink=False):
+    # never write through an existing destination, it may be a hardlink back into static/
+    if os.path.lexists(dst_path):
+        os.remove(dst_path)
+    if hardlink:
+        try:
+            os.link(src_path, dst_path)
+            return
+        except OSError:
+            pass
+    try:
+        reflink(src_path, dst_path)
+    except OSError:
+        shutil.copy2(src_path, dst_path)
+
+
+def minify_file(src_path, dst_path):
+    # css is small, so it is minified on every sync and only written when the
+    # result differs from what is there
+    with open(src_path, "r", encoding="utf-8") as f:
+        return write_if_changed(dst_path, minify_css(f.read()))
+
+
+def sync_static_files(src, dst, previous=(), use_hash=False, hardlink=False, jobs=None, minify=False):
+    # previous is the file list returned by the last sync, anything in it that
+    # is gone from src gets pruned from dst
+    src_files = list_files(src)
+    to_copy = []
+    to_minify = []
+    for rel_path in src_files:
+        src_path = os.path.join(src, rel_path)
+        dst_path = os.path.join(dst, rel_path)
+        if minify and rel_path.endswith('.css'):
+            to_minify.append((src_path, dst_path))
+        elif needs_copy(src_path, dst_path, src_files[rel_path], use_hash):
+            to_copy.append((src_path, dst_path))
+
+    for dir_path in sorted({os.path.dirname(dst_path) for _, dst_path in to_copy + to_minify}):
+        os.makedirs(dir_path, exist_ok=True)
+
+    failures = []
+
+    def copy_one(paths):
+        src_path, dst_path = paths
+        try:
+            logger.debug(f"Copying {src_path} to {dst_path}")
+            copy_file(src_path, dst_path, hardlink)
+        except OSError as e:
+            logger.error(f"Failed to copy {src_path}: {e}")
+            failures.append(src_path)
+
+    def minify_one(paths):
+        src_path, dst_path = paths
+        try:
+            return minify_file(src_path, dst_path)
+        except (OSError, UnicodeDecodeError) as e:
+            logger.error(f"Failed to minify {src_path}: {e}")
+            failures.append(src_path)
+            return None
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        list(executor.map(copy_one, to_copy))
+        minified = list(executor.map(minify_one, to_minify))
+    copied = len(to_copy) - (len(failures) - minified.count(None)) + minified.count(True)
+    unchanged = len(src_files) - len(to_copy) - len(to_minify) + minified.count(False)
+
+    removed = 0
+    for rel_path in sorted(set(previous) - set(src_files)):
+        dst_path = os.path.join(dst, rel_path)
+        if os.path.lexists(dst_path):
+            os.remove(dst_path)
+            remove_empty_dirs(os.path.dirname(dst_path), dst)
+            removed += 1
+
+    logger.info(f"Synced {src} to {dst}: {copied} copied, {unchanged} unchanged, {removed} removed")
+    return sorted(src_files), failures
@@ -0,0 +1,119 @@
+import os
+import re
+
+PLACEHOLDER_PATTERN = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+ROOT_LINK_PATTERN = re.compile(r'(href|src)="/')
+INCLUDE_PATTERN = re.compile(r"\{\{>\s*([^\s}]+)\s*\}\}")
+SECTION_TEMPLATE_DIR = 'templates'
+
+_template_cache = {}
+
+
+def rewrite_links(html, basepath):
+    # one pass for both href="/ and src="/ instead of a str.replace per attribute
+    if basepath == '/' or '="/' not in html:
+        return html
+    return ROOT_LINK_PATTERN.sub(r'\1="' + basepath.replace('\\', r'\\'), html)
+
+
+def expand_includes(path, stack=()):
+    # returns the source with every {{> partial }} replaced by that file,
+    # resolved relative to the including file, and every file it was built from
+    path = os.path.normpath(path)
+    if path in stack:
+        raise Exception(f"include cycle: {' -> '.join(stack + (path,))}")
+    with open(path, "r", encoding="utf-8") as f:
+        source = f.read()
+    files = [path]
+
+    def include(match):
+        partial_path = os.path.join(os.path.dirname(path), match.group(1))
+        partial_source, partial_files = expand_includes(partial_path, stack + (path,))
+        files.extend(name for name in partial_files if name not in files)
+        return partial_source
+
+    return INCLUDE_PATTERN.sub(include, source), files
+
+
+def find_template(source_path, content_dir, default_path, name=None):
+    # A page with "template: <name>" in its front matter uses
+    # templates/<name>.html, next to the default template. Other pages under
+    # content/<section>/ use templates/<section>.html when there is one.
+    if name:
+        return os.path.join(os.path.dirname(default_path), SECTION_TEMPLATE_DIR, f"{name}.html")
+    rel_path = os.path.relpath(source_path, content_dir)
+    if os.sep in rel_path:
+        section = rel_path.split(os.sep, 1)[0]
+        path = os.path.join(os.path.dirname(default_path), SECTION_TEMPLATE_DIR, f"{section}.html")
+        if os.path.isfile(path):
+            return path
+    return default_path
+
+
+class Template:
+    def __init__(self, source, basepath='/', files=()):
+        self.source = source
+        self.basepath = basepath
+        # the template file and its partials, in include order
+        self.files = list(files)
+        # literal text is stored with its links already rewritten, placeholders
+        # keep their original text so unknown names render unchanged
+        self.segments = []
+        pos = 0
+        for match in PLACEHOLDER_PATTERN.finditer(source):
+            if match.start() > pos:
+                self.segments.append((rewrite_links(source[pos:match.start()], basepath), None))
+            self.segments.append((match.group(0), match.group(1)))
+            pos = match.end()
+        if pos < len(source):
+            self.segments.append((rewrite_links(source[pos:], basepath), None))
+
+    @property
+    def placeholders(self):
+        return [name for _, name in self.segments if name is not None]
+
+    def iter_render(self, context):
+        basepath = self.basepath
+        for text, name in self.segments:
+            if name is None:
+                yield text
+                continue
+            value = context.get(name)
+            if value is None:
+                yield text
+            elif isinstance(value, str):
+                yield rewrite_links(value, basepath)
+            else:
+                # an HTMLNode, streamed chunk by chunk
+                for chunk in value.iter_html():
+                    yield rewrite_links(chunk, basepath)
+
+    def render(self, context):
+        return ''.join(self.iter_render(context))
+
+    def write(self, fp, context):
+        fp.writelines(self.iter_render(context))
+
+
+def _stamp(files):
+    stamps = []
+    for path in files:
+        stat = os.stat(path)
+        stamps.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(stamps)
+
+
+def load_template(path, basepath='/'):
+    # cached until the template or one of its partials changes
+    key = (os.path.abspath(path), basepath)
+    cached = _template_cache.get(key)
+    if cached is not None:
+        try:
+            if _stamp(cached[1].files) == cached[0]:
+                return cached[1]
+        except FileNotFoundError:
+            pass
+    source, files = expand_includes(path)
+    template = Template(source, basepath, files)
+    _template_cache[key] = (_stamp(files), template)
+    return template
@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+
+from bench import SHAPES, STAGES, bench_inline, bench_pages, generate_corpus, measure_memory, run
+from blocks import INLINE_CACHE, markdown_to_html_node
+
+
+class TestBench(unittest.TestCase):
+    def read_corpus(self, root, shape):
+        paths = generate_corpus(root, shape, scale=0.05, seed=7)
+        contents = []
+        for path in paths:
+            with open(path, encoding="utf-8") as f:
+                contents.append(f.read())
+        return contents
+
+    def test_corpus_is_deterministic(self):
+        with tempfile.TemporaryDirectory() as first, tempfile.TemporaryDirectory() as second:
+            for shape in SHAPES:
+                self.assertEqual(self.read_corpus(first, shape), self.read_corpus(second, shape))
+
+    def test_corpus_pages_render(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for shape in SHAPES:
+                for contents in self.read_corpus(os.path.join(tmp, shape), shape):
+                    markdown_to_html_node(contents).to_html()
+
+    def test_run_reports_every_stage(self):
+        results = run(['small'], scale=0.02, repeat=1)
+        self.assertEqual(results['small']['pages'], 4)
+        self.assertEqual(set(results['small']['stages']), set(STAGES))
+
+    def test_every_repeat_parses_cold(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = generate_corpus(os.path.join(tmp, "small"), "small", scale=0.02, seed=7)
+            bench_pages(paths, tmp)
+            first = (INLINE_CACHE.hits, INLINE_CACHE.misses)
+            bench_pages(paths, tmp)
+            # a warm cache would turn the second run's misses into hits
+            self.assertEqual((INLINE_CACHE.hits, INLINE_CACHE.misses), first)
+
+    def test_measure_memory(self):
+        memory = measure_memory(scale=0.01)
+        self.assertGreater(memory['html_nodes'], 0)
+        self.assertGreater(memory['bytes_per_html_node'], 0)
+        self.assertGreater(memory['text_nodes'], 0)
+
+    def test_bench_inline(self):
+        results = bench_inline(count=20, repeat=1)
+        self.assertEqual(set(results), {'plain', 'formatted'})
+        self.assertEqual(set(results['plain']), {'text_to_textnodes', 'chained'})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,8 @@
 import unittest
 
-from blocks import markdown_to_blocks, block_to_block_type, markdown_to_html_node, get_heading_level
+from blocks import markdown_to_blocks, block_to_block_type, markdown_to_html_node, get_heading_level, BlockType, \
+    iter_blocks, iter_markdown_html, INLINE_CACHE
+from highlight import HIGHLIGHTER_VERSION
 
 
 class TestMarkdownToBlocks(unittest.TestCase):
@@ -108,4 +110,67 @@ the **same** even with inline stuff
         self.assertEqual(
             html,
             "<div><pre><code>This is text that _should_ remain\nthe **same** even with inline stuff\n</code></pre></div>",
-        )
\ No newline at end of file
+        )
+
+    def test_codeblock_with_blank_lines(self):
+        md = """
+```
+first line
+
+    indented after a blank line
+
+
+last line
+```
+
+after
+"""
+        self.assertEqual(
+            markdown_to_blocks(md),
+            ["```\nfirst line\n\n    indented after a blank line\n\n\nlast line\n```", "after"],
+        )
+        self.assertEqual(
+            markdown_to_html_node(md).to_html(),
+            "<div><pre><code>first line\n\n    indented after a blank line\n\n\nlast line\n</code></pre>"
+            "<p>after</p></div>",
+        )
+
+    @unittest.skipIf(HIGHLIGHTER_VERSION is None, "Pygments is not installed")
+    def test_codeblock_with_language_is_highlighted(self):
+        html = markdown_to_html_node("```python\ndef f(): pass\n```").to_html()
+        self.assertTrue(html.startswith('<div><pre class="highlight"><code class="language-python">'))
+        self.assertIn('<span class="k">def</span>', html)
+        self.assertTrue(html.endswith('\n</code></pre></div>'))
+
+    def test_codeblock_with_unknown_language_stays_plain(self):
+        self.assertEqual(markdown_to_html_node("```nosuchlanguage\na < b\n```").to_html(),
+                         "<div><pre><code>a < b\n</code></pre></div>")
+
+    def test_unclosed_fence_splits_normally(self):
+        md = "```\ncode\n\nmore"
+        self.assertEqual(markdown_to_blocks(md), ["```\ncode", "more"])
+
+    def test_single_line_fence(self):
+        self.assertEqual(markdown_to_blocks("```x```\n\ntext"), ["```x```", "text"])
+
+    def test_iter_blocks_classifies_in_order(self):
+        md = "# Title\n\n> quote\n> more\n\n- a\n- b\n\n1. a\n2. b\n\n1. a\n3. b\n\n```\nx\n```"
+        self.assertEqual(
+            [block_type for block_type, _ in iter_blocks(md.split("\n"))],
+            [BlockType.HEADING, BlockType.QUOTE, BlockType.UNORDERED, BlockType.ORDERED, BlockType.PARA,
+             BlockType.CODE],
+        )
+
+    def test_iter_markdown_html_matches_tree(self):
+        md = "# Title\n\nsome **bold** text\n\n```\ncode\n\nmore\n```\n\n- a\n- b\n\n> quote"
+        self.assertEqual(''.join(iter_markdown_html(iter(md.split("\n")))), markdown_to_html_node(md).to_html())
+        self.assertEqual(''.join(iter_markdown_html([])), markdown_to_html_node("").to_html())
+
+    def test_repeated_inline_text_is_memoized(self):
+        md = "- **same** item\n- **same** item\n\n**same** item"
+        INLINE_CACHE.clear()
+        html = markdown_to_html_node(md).to_html()
+        self.assertEqual(html, "<div><ul><li><b>same</b> item</li><li><b>same</b> item</li></ul>"
+                               "<p><b>same</b> item</p></div>")
+        self.assertEqual((INLINE_CACHE.hits, INLINE_CACHE.misses), (2, 1))
+        self.assertEqual(markdown_to_html_node(md).to_html(), html)
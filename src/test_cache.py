@@ -0,0 +1,78 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import cache
+from blocks import markdown_to_html_node
+from cache import ASTCache, node_from_tuple, node_to_tuple
+from linkcheck import node_targets
+
+MARKDOWN = """# Title
+
+Some **bold** text with a [link](/blog) and ![image](/images/tom.png)
+
+- one
+- two
+
+```
+code
+```
+"""
+
+
+class TestASTCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ASTCache(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def entries(self):
+        return [os.path.join(dirpath, filename)
+                for dirpath, _, filenames in os.walk(self.tmp.name) for filename in filenames]
+
+    def test_tuple_roundtrip(self):
+        node = markdown_to_html_node(MARKDOWN)
+        self.assertEqual(node_from_tuple(node_to_tuple(node)), node)
+        # the link targets of the inline fragments come back with them
+        self.assertEqual(node_targets(node_from_tuple(node_to_tuple(node))), ['/blog', '/images/tom.png'])
+
+    def test_parse_hits_after_first_miss(self):
+        first = self.cache.parse(MARKDOWN)
+        second = self.cache.parse(MARKDOWN)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        self.assertEqual(first, second)
+        self.assertEqual(second.to_html(), markdown_to_html_node(MARKDOWN).to_html())
+
+    def test_parser_version_is_part_of_the_key(self):
+        self.cache.parse(MARKDOWN)
+        with mock.patch.object(cache, "PARSER_VERSION", -1):
+            self.assertIsNone(self.cache.get(MARKDOWN))
+
+    def test_corrupt_entry_is_a_miss(self):
+        self.cache.parse(MARKDOWN)
+        with open(self.entries()[0], "wb") as f:
+            f.write(b"not a cache entry")
+        with self.assertLogs("cache", "WARNING"):
+            self.assertIsNone(self.cache.get(MARKDOWN))
+
+    def test_evict_least_recently_used(self):
+        documents = [f"# Page {n}\n\ntext {n}" for n in range(3)]
+        for n, document in enumerate(documents):
+            self.cache.parse(document)
+            path = self.cache.path(self.cache.key(document))
+            os.utime(path, ns=(n * 10**9, n * 10**9))
+        # reading the oldest entry makes it the most recently used
+        self.cache.parse(documents[0])
+        size = os.path.getsize(self.entries()[0])
+        self.cache.max_bytes = 2 * size
+        self.cache.evict()
+        self.assertIsNone(self.cache.get(documents[1]))
+        self.assertIsNotNone(self.cache.get(documents[0]))
+        self.assertIsNotNone(self.cache.get(documents[2]))
+
+
+if __name__ == "__main__":
+    unittest.main()
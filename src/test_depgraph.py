@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+
+from depgraph import DependencyGraph, link_source, page_links
+from manifest import new_manifest
+
+
+class TestLinks(unittest.TestCase):
+    def test_link_source(self):
+        self.assertEqual(link_source("/", "content"), os.path.join("content", "index.md"))
+        self.assertEqual(link_source("/blog/tom", "content"), os.path.join("content", "blog", "tom", "index.md"))
+        self.assertEqual(link_source("/blog/tom/#top", "content"), os.path.join("content", "blog", "tom", "index.md"))
+        self.assertEqual(link_source("/about.html", "content"), os.path.join("content", "about.md"))
+        self.assertIsNone(link_source("/images/tom.png", "content"))
+
+    def test_page_links_skips_external_links_and_assets(self):
+        md = "[home](/) and [tom](/blog/tom) ![tom](/images/tom.png) [boot](https://boot.dev) [again](/)"
+        self.assertEqual(page_links(md, "content"),
+                         [os.path.join("content", "index.md"), os.path.join("content", "blog", "tom", "index.md")])
+
+
+class TestDependencyGraph(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.template = self.write("template.html", "{{ Content }}")
+        self.partial = self.write("nav.html", "<nav></nav>")
+        self.output = self.write("index.html", "")
+        self.manifest = new_manifest()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, contents):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "w") as f:
+            f.write(contents)
+        return path
+
+    def build(self, sources=("content/index.md", "content/blog/index.md")):
+        graph = DependencyGraph(self.manifest, sources)
+        deps = graph.dependencies([self.template, self.partial])
+        return graph, deps
+
+    def test_unchanged_page_is_current(self):
+        graph, deps = self.build()
+        self.assertEqual(graph.reasons("content/index.md", "abc", self.output, deps), ["new page"])
+        graph.record("content/index.md", "abc", self.output, deps, ["content/blog/index.md"])
+        graph, deps = self.build()
+        self.assertEqual(graph.reasons("content/index.md", "abc", self.output, deps), [])
+
+    def test_partial_change_is_explained(self):
+        graph, deps = self.build()
+        graph.record("content/index.md", "abc", self.output, deps, [])
+        self.write("nav.html", "<nav>new</nav>")
+        graph, deps = self.build()
+        self.assertEqual(graph.reasons("content/index.md", "def", self.output, deps),
+                         ["source changed", f"{self.partial} changed"])
+
+    def test_missing_output_is_rebuilt(self):
+        graph, deps = self.build()
+        graph.record("content/index.md", "abc", self.output, deps, [])
+        os.remove(self.output)
+        graph, deps = self.build()
+        self.assertEqual(graph.reasons("content/index.md", "abc", self.output, deps), ["output missing"])
+
+    def test_removed_link_target_invalidates_page(self):
+        graph, deps = self.build()
+        graph.record("content/index.md", "abc", self.output, deps, ["content/blog/index.md"])
+        graph, deps = self.build(sources=("content/index.md",))
+        self.assertEqual(graph.reasons("content/index.md", "abc", self.output, deps),
+                         ["linked page content/blog/index.md was removed"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+
+import os
+import tempfile
+
+from frontmatter import front_matter, meta_bool, meta_list, read_front_matter, split_front_matter, yaml
+
+
+class TestFrontMatter(unittest.TestCase):
+    def test_split_front_matter(self):
+        meta, body = split_front_matter('---\ntitle: "Tom"\ndate: 2024-03-01\ntags: [tolkien, essays]\n---\n# Tom\n')
+        self.assertEqual(meta, {'title': 'Tom', 'date': '2024-03-01', 'tags': ['tolkien', 'essays']})
+        self.assertEqual(body, '# Tom\n')
+
+    def test_no_front_matter(self):
+        self.assertEqual(split_front_matter('# Tom\n\n---\n'), ({}, '# Tom\n\n---\n'))
+
+    def test_unclosed_front_matter_is_body(self):
+        self.assertEqual(split_front_matter('---\ntitle: Tom\n# Tom'), ({}, '---\ntitle: Tom\n# Tom'))
+
+    @unittest.skipIf(yaml is None, "PyYAML is not installed")
+    def test_yaml_front_matter(self):
+        meta, body = split_front_matter('---\nTitle: Tom\ndate: 2024-03-01\ndraft: false\ntags:\n  - a\n  - b\n---\nbody')
+        self.assertEqual(meta, {'title': 'Tom', 'date': '2024-03-01', 'draft': False, 'tags': ['a', 'b']})
+        self.assertEqual(body, 'body')
+
+    def test_yaml_errors_fall_back_to_key_value_lines(self):
+        self.assertEqual(front_matter('---\ntitle: Tom: the story\n---\n'), {'title': 'Tom: the story'})
+
+    def test_toml_front_matter(self):
+        meta, body = split_front_matter('+++\ntitle = "Tom"\ndate = 2024-03-01\ntags = ["a"]\n+++\n# Tom')
+        self.assertEqual(meta, {'title': 'Tom', 'date': '2024-03-01', 'tags': ['a']})
+        self.assertEqual(body, '# Tom')
+
+    def test_read_front_matter_stops_at_the_header(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "page.md")
+            with open(path, "wb") as f:
+                # the body is not valid UTF-8, so reading it would fail
+                f.write(b'---\ntitle: Tom\n---\n' + b'x' * 65536 + b'\n\xff\n')
+            self.assertEqual(read_front_matter(path), {'title': 'Tom'})
+            with open(path, "w") as f:
+                f.write('# Tom\n')
+            self.assertEqual(read_front_matter(path), {})
+
+    def test_meta_bool(self):
+        self.assertTrue(meta_bool({'draft': 'yes'}, 'draft'))
+        self.assertTrue(meta_bool({'draft': True}, 'draft'))
+        self.assertFalse(meta_bool({'draft': 'false'}, 'draft'))
+        self.assertFalse(meta_bool({}, 'draft'))
+
+    def test_meta_list(self):
+        self.assertEqual(meta_list({'tags': 'a, b ,'}, 'tags'), ['a', 'b'])
+        self.assertEqual(meta_list({'tags': ['a']}, 'tags'), ['a'])
+        self.assertEqual(meta_list({}, 'tags'), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,11 @@
+import os
+import tempfile
 import unittest
+from unittest import mock
 
-from src.helper import extract_title
+from src import helper
+from src.helper import extract_title, generate_pages_recursive
+from src.manifest import hash_file, new_manifest
 
 
 class TestHelperFunctions(unittest.TestCase):
@@ -20,4 +25,251 @@ class TestHelperFunctions(unittest.TestCase):
 # This should return Hello        
 '''
         result = extract_title(md)
-        self.assertEqual(result, "Hello")
\ No newline at end of file
+        self.assertEqual(result, "Hello")
+
+    def test_extract_title_prefers_front_matter(self):
+        self.assertEqual(extract_title("# Hello", {'title': 'Hi'}), "Hi")
+
+
+class TestGeneratePages(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        with open(self.template, "w") as f:
+            f.write('<title>{{ Title }}</title><a href="/">home</a>{{ Content }}')
+        for i in range(6):
+            self.write_page(f"post{i}/index.md", f"# Post {i}\n\nSome **bold** text [home](/) number {i}\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_page(self, name, contents):
+        path = os.path.join(self.content, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(contents)
+
+    def read_tree(self, root):
+        tree = {}
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                with open(path, "rb") as f:
+                    tree[os.path.relpath(path, root)] = f.read()
+        return tree
+
+    def test_parallel_output_matches_serial(self):
+        serial = os.path.join(self.tmp.name, "serial")
+        parallel = os.path.join(self.tmp.name, "parallel")
+        self.assertEqual(generate_pages_recursive(self.content, self.template, serial, "/base/"), [])
+        self.assertEqual(generate_pages_recursive(self.content, self.template, parallel, "/base/", jobs=3), [])
+        self.assertEqual(len(self.read_tree(serial)), 6)
+        self.assertEqual(self.read_tree(serial), self.read_tree(parallel))
+
+    def test_streamed_pages_match_rendered(self):
+        self.write_page("long/index.md", "# Long\n\n```\ncode\n\nblock\n```\n\n- a\n- b\n\n> quote\n")
+        rendered = os.path.join(self.tmp.name, "rendered")
+        serial = os.path.join(self.tmp.name, "serial")
+        parallel = os.path.join(self.tmp.name, "parallel")
+        generate_pages_recursive(self.content, self.template, rendered, "/base/")
+        generate_pages_recursive(self.content, self.template, serial, "/base/", stream_threshold=0)
+        generate_pages_recursive(self.content, self.template, parallel, "/base/", jobs=3, stream_threshold=0)
+        self.assertEqual(self.read_tree(rendered), self.read_tree(serial))
+        self.assertEqual(self.read_tree(rendered), self.read_tree(parallel))
+
+    def test_section_template_change_rebuilds_only_its_pages(self):
+        section = os.path.join(self.tmp.name, "templates", "post0.html")
+        os.makedirs(os.path.dirname(section))
+        with open(section, "w") as f:
+            f.write("<h1>{{ Title }}</h1>")
+        dest = os.path.join(self.tmp.name, "docs")
+        manifest = new_manifest()
+        generate_pages_recursive(self.content, self.template, dest, "/", manifest)
+        with open(os.path.join(dest, "post0", "index.html")) as f:
+            self.assertEqual(f.read(), "<h1>Post 0</h1>")
+        with open(section, "w") as f:
+            f.write("<h2>{{ Title }}</h2>")
+        outputs = {os.path.join(dest, f"post{i}", "index.html"): os.stat(os.path.join(dest, f"post{i}", "index.html"))
+                   for i in range(6)}
+        generate_pages_recursive(self.content, self.template, dest, "/", manifest)
+        rebuilt = [path for path, stat in outputs.items() if os.stat(path).st_ino != stat.st_ino]
+        self.assertEqual(rebuilt, [os.path.join(dest, "post0", "index.html")])
+
+    def test_front_matter_feeds_listings(self):
+        self.write_page("blog/tom/index.md", "---\ndate: 2024-01-02\ntags: tolkien\n---\n# Tom\n\nhello\n")
+        dest = os.path.join(self.tmp.name, "docs")
+        manifest = new_manifest()
+        self.assertEqual(generate_pages_recursive(self.content, self.template, dest, "/", manifest), [])
+        with open(os.path.join(dest, "blog", "tom", "index.html")) as f:
+            self.assertEqual(f.read(), '<title>Tom</title><a href="/">home</a><div><h1>Tom</h1><p>hello</p></div>')
+        self.assertTrue(os.path.exists(os.path.join(dest, "blog", "index.html")))
+        self.assertTrue(os.path.exists(os.path.join(dest, "tags", "tolkien", "index.html")))
+
+        # an incremental build reads nothing but still knows every page
+        generate_pages_recursive(self.content, self.template, dest, "/", manifest, site_url="https://example.com")
+        with open(os.path.join(dest, "sitemap.xml")) as f:
+            sitemap = f.read()
+        self.assertEqual(sitemap.count("<loc>"), 9)
+        self.assertIn("<loc>https://example.com/blog/tom/</loc><lastmod>2024-01-02</lastmod>", sitemap)
+
+    def test_front_matter_title_wins_everywhere(self):
+        self.write_page("blog/tom/index.md", "---\ntitle: Tom Bombadil\ndate: 2024-01-02\n---\n# Tom\n\nhello\n")
+        for name, threshold in (("rendered", None), ("streamed", 0)):
+            dest = os.path.join(self.tmp.name, name)
+            generate_pages_recursive(self.content, self.template, dest, "/", new_manifest(),
+                                     **({} if threshold is None else {'stream_threshold': threshold}))
+            with open(os.path.join(dest, "blog", "tom", "index.html")) as f:
+                self.assertTrue(f.read().startswith('<title>Tom Bombadil</title>'))
+            with open(os.path.join(dest, "blog", "index.html")) as f:
+                self.assertIn('<a href="/blog/tom/">Tom Bombadil</a>', f.read())
+
+    def test_yaml_number_dates_are_listed(self):
+        self.write_page("blog/old/index.md", "---\ndate: 2024\n---\n# Old\n")
+        self.write_page("blog/new/index.md", "---\ndate: 2024-01-02\n---\n# New\n")
+        dest = os.path.join(self.tmp.name, "docs")
+        self.assertEqual(generate_pages_recursive(self.content, self.template, dest, "/", new_manifest()), [])
+        with open(os.path.join(dest, "blog", "index.html")) as f:
+            listing = f.read()
+        self.assertIn('<a href="/blog/new/">New</a> <time>2024-01-02</time></li>'
+                      '<li><a href="/blog/old/">Old</a> <time>2024</time>', listing)
+
+    def test_incremental_build_trusts_size_and_mtime(self):
+        dest = os.path.join(self.tmp.name, "docs")
+        manifest = new_manifest()
+        generate_pages_recursive(self.content, self.template, dest, "/", manifest)
+        source = os.path.join(self.content, "post0", "index.md")
+        stat = os.stat(source)
+        # same size and mtime, so the edit goes unseen until the mtime moves
+        self.write_page("post0/index.md", "# Post X\n\nSome **bold** text [home](/) number 0\n")
+        os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        generate_pages_recursive(self.content, self.template, dest, "/", manifest)
+        with open(os.path.join(dest, "post0", "index.html")) as f:
+            self.assertIn("Post 0", f.read())
+        os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        generate_pages_recursive(self.content, self.template, dest, "/", manifest)
+        with open(os.path.join(dest, "post0", "index.html")) as f:
+            self.assertIn("Post X", f.read())
+
+    def test_full_rebuild_keeps_unchanged_outputs(self):
+        dest = os.path.join(self.tmp.name, "docs")
+        generate_pages_recursive(self.content, self.template, dest, "/")
+        unchanged = os.path.join(dest, "post0", "index.html")
+        changed = os.path.join(dest, "post1", "index.html")
+        os.utime(unchanged, ns=(0, 0))
+        os.utime(changed, ns=(0, 0))
+        self.write_page("post1/index.md", "# Post 1\n\nedited\n")
+        self.assertEqual(generate_pages_recursive(self.content, self.template, dest, "/", io_threads=2), [])
+        self.assertEqual(os.stat(unchanged).st_mtime_ns, 0)
+        self.assertNotEqual(os.stat(changed).st_mtime_ns, 0)
+
+    def test_drafts_are_left_out(self):
+        self.write_page("draft/index.md", "---\ndraft: true\n---\n# Draft\n")
+        dest = os.path.join(self.tmp.name, "docs")
+        manifest = new_manifest()
+        generate_pages_recursive(self.content, self.template, dest, "/", manifest, drafts=True)
+        self.assertTrue(os.path.exists(os.path.join(dest, "draft", "index.html")))
+        generate_pages_recursive(self.content, self.template, dest, "/", manifest)
+        self.assertFalse(os.path.exists(os.path.join(dest, "draft", "index.html")))
+        self.assertNotIn(os.path.join(self.content, "draft", "index.md"), manifest['index'])
+
+    def test_front_matter_template_and_placeholders(self):
+        named = os.path.join(self.tmp.name, "templates", "wide.html")
+        os.makedirs(os.path.dirname(named))
+        with open(named, "w") as f:
+            f.write("<h1>{{ Title }}</h1><time>{{ date }}</time><p>{{ tags }}</p>{{ Content }}")
+        self.write_page("wide/index.md", "+++\ntemplate = \"wide\"\ntitle = \"Wide & tall\"\n"
+                                         "date = 2024-05-06\ntags = [\"a\", \"b\"]\n+++\nno heading\n")
+        dest = os.path.join(self.tmp.name, "docs")
+        manifest = new_manifest()
+        self.assertEqual(generate_pages_recursive(self.content, self.template, dest, "/", manifest), [])
+        output = os.path.join(dest, "wide", "index.html")
+        with open(output) as f:
+            self.assertEqual(f.read(), "<h1>Wide & tall</h1><time>2024-05-06</time><p>a, b</p>"
+                                       "<div><p>no heading</p></div>")
+        # unchanged, so the recorded template name is used without reading the page
+        with open(named, "w") as f:
+            f.write("<h2>{{ Title }}</h2>")
+        generate_pages_recursive(self.content, self.template, dest, "/", manifest)
+        with open(output) as f:
+            self.assertEqual(f.read(), "<h2>Wide & tall</h2>")
+
+    def test_pages_render_while_sources_are_read(self):
+        for i in range(6, 20):
+            self.write_page(f"post{i}/index.md", f"# Post {i}\n")
+        events = []
+        read_text, render_output = helper.read_text, helper.render_output
+
+        def reading(path):
+            events.append('read')
+            return read_text(path)
+
+        def rendering(*args, **kwargs):
+            events.append('render')
+            return render_output(*args, **kwargs)
+
+        dest = os.path.join(self.tmp.name, "docs")
+        with mock.patch.object(helper, "read_text", reading), mock.patch.object(helper, "render_output", rendering):
+            generate_pages_recursive(self.content, self.template, dest, "/", new_manifest(), io_threads=1)
+        self.assertEqual(events.count('render'), 20)
+        self.assertLess(events.index('render'), len(events) - 1 - events[::-1].index('read'))
+
+    def test_targets_collected_while_rendering(self):
+        dest = os.path.join(self.tmp.name, "docs")
+        manifest = new_manifest()
+        generate_pages_recursive(self.content, self.template, dest, "/", manifest, jobs=2)
+        self.assertEqual(manifest['pages'][os.path.join(self.content, "post0", "index.md")]['targets'], ['/'])
+        # nothing keeps them without a manifest or images
+        with mock.patch.object(helper, "node_targets") as node_targets:
+            generate_pages_recursive(self.content, self.template, os.path.join(self.tmp.name, "plain"), "/")
+        node_targets.assert_not_called()
+
+    def test_recorded_output_hash_is_trusted(self):
+        dest = os.path.join(self.tmp.name, "docs")
+        manifest = new_manifest()
+        generate_pages_recursive(self.content, self.template, dest, "/", manifest)
+        source = os.path.join(self.content, "post0", "index.md")
+        output = os.path.join(dest, "post0", "index.html")
+        self.assertEqual(manifest['pages'][source]['output_hash'], hash_file(output))
+        # every page is rendered again, the outputs are not read back to compare
+        with open(output, "r+b") as f:
+            f.write(b"<TITLE>")
+        for entry in manifest['pages'].values():
+            entry['hash'] = None
+        generate_pages_recursive(self.content, self.template, dest, "/", manifest, jobs=2)
+        with open(output, "rb") as f:
+            self.assertTrue(f.read().startswith(b"<TITLE>"))
+
+    def test_failures_reported_per_page(self):
+        self.write_page("broken/index.md", "no title here\n")
+        dest = os.path.join(self.tmp.name, "docs")
+        failures = generate_pages_recursive(self.content, self.template, dest, "/", jobs=2)
+        self.assertEqual(failures, [os.path.join(self.content, "broken", "index.md")])
+        self.assertEqual(len(self.read_tree(dest)), 6)
+
+    def test_bad_front_matter_fails_alone(self):
+        self.write_page("string/index.md", "---\njust a string\n---\n# String\n")
+        self.write_page("toml/index.md", "+++\ntitle = \n+++\n# Toml\n")
+        latin1 = os.path.join(self.content, "latin1", "index.md")
+        os.makedirs(os.path.dirname(latin1))
+        with open(latin1, "wb") as f:
+            f.write(b"---\ntitle: Caf\xe9\n---\n")
+        dest = os.path.join(self.tmp.name, "docs")
+        manifest = new_manifest()
+        with self.assertLogs(level="ERROR"):
+            failures = generate_pages_recursive(self.content, self.template, dest, "/", manifest)
+        self.assertEqual(sorted(failures), [latin1, os.path.join(self.content, "string", "index.md"),
+                                            os.path.join(self.content, "toml", "index.md")])
+        self.assertEqual(len(manifest['pages']), 6)
+
+    def test_unreadable_source_fails_alone(self):
+        source = os.path.join(self.content, "latin1", "index.md")
+        os.makedirs(os.path.dirname(source))
+        with open(source, "wb") as f:
+            f.write(b"# Caf\xe9\n")
+        dest = os.path.join(self.tmp.name, "docs")
+        manifest = new_manifest()
+        self.assertEqual(generate_pages_recursive(self.content, self.template, dest, "/", manifest, drafts=True),
+                         [source])
+        self.assertEqual(len(self.read_tree(dest)), 6)
+        self.assertEqual(len(manifest['pages']), 6)
@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+import unittest
+
+from src import highlight
+from src.highlight import HIGHLIGHT_CACHE, HIGHLIGHTER_VERSION, fence_language, highlight_code
+
+
+class TestFenceLanguage(unittest.TestCase):
+    def test_fence_language(self):
+        self.assertEqual(fence_language("```Python"), "python")
+        self.assertEqual(fence_language("``` js title=app.js"), "js")
+        self.assertIsNone(fence_language("```"))
+
+
+@unittest.skipIf(HIGHLIGHTER_VERSION is None, "Pygments is not installed")
+class TestHighlightCode(unittest.TestCase):
+    def setUp(self):
+        HIGHLIGHT_CACHE.clear()
+
+    def test_highlight_is_cached(self):
+        first = highlight_code("x = 1\n", "python")
+        self.assertIn('<span class="n">x</span>', first)
+        self.assertEqual(highlight_code("x = 1\n", "python"), first)
+        self.assertEqual((HIGHLIGHT_CACHE.hits, HIGHLIGHT_CACHE.misses), (1, 1))
+
+    def test_cache_key_includes_language(self):
+        highlight_code("x = 1\n", "python")
+        self.assertNotEqual(highlight_code("x = 1\n", "text"), highlight_code("x = 1\n", "python"))
+
+    def test_unknown_or_missing_language(self):
+        self.assertIsNone(highlight_code("x = 1\n", "nosuchlanguage"))
+        self.assertIsNone(highlight_code("x = 1\n", None))
+
+    def test_formatter_is_imported_on_first_use(self):
+        # a fresh interpreter, other tests have imported it already
+        code = ("import sys, blocks; blocks.markdown_to_html_node('```\\nx\\n```');"
+                "print('pygments.formatters' in sys.modules)")
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(highlight.__file__)))
+        self.assertEqual(result.stdout.strip(), "False")
+
+    def test_long_blocks_stay_plain(self):
+        self.assertIsNone(highlight_code("x = 1\n" * highlight.HIGHLIGHT_MAX_CHARS, "python"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,4 @@
+import io
 import unittest
 
 from htmlnode import HTMLNode, LeafNode, ParentNode
@@ -19,6 +20,20 @@ class TestHTMLNode(unittest.TestCase):
         different_node = HTMLNode("node")
         self.assertNotEqual(node, different_node)
 
+    def test_nodes_have_no_instance_dict(self):
+        for node in (HTMLNode("p"), LeafNode("b", "x"), ParentNode("div", [])):
+            self.assertFalse(hasattr(node, "__dict__"))
+
+    def test_tags_are_interned(self):
+        level = 2
+        first = LeafNode(f"h{level}", "a")
+        second = ParentNode(f"h{level}", [])
+        self.assertIs(first.tag, second.tag)
+
+    def test_repr(self):
+        node = LeafNode("a", "link", props={"href": "/"})
+        self.assertEqual(repr(node), 'HTMLNode(a, link, None,href="/" )')
+
 
 class TestLeafNode(unittest.TestCase):
     def test_eq(self):
@@ -78,5 +93,23 @@ class TestParentNode(unittest.TestCase):
         parent = ParentNode("div", [])
         self.assertEqual(parent.to_html(), "<div></div>")
 
+    def test_iter_html_chunks(self):
+        link = LeafNode("a", "home", props={"href": "/"})
+        parent = ParentNode("div", [ParentNode("p", [LeafNode(None, "go "), link])])
+        self.assertEqual(list(parent.iter_html()),
+                         ["<div>", "<p>", "go ", '<a href="/">home</a>', "</p>", "</div>"])
+
+    def test_write_html_matches_to_html(self):
+        parent = ParentNode("ul", [ParentNode("li", [LeafNode("b", str(i))]) for i in range(1000)],
+                            props={"class": "wide"})
+        buffer = io.StringIO()
+        parent.write_html(buffer)
+        self.assertEqual(buffer.getvalue(), parent.to_html())
+        self.assertTrue(buffer.getvalue().startswith('<ul class="wide"><li><b>0</b></li>'))
+
+    def test_empty_rendered_children_fall_back_to_value(self):
+        parent = ParentNode("blockquote", [LeafNode(None, "")])
+        self.assertEqual(parent.to_html(), "<blockquote>None</blockquote>")
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,165 @@
+import os
+import struct
+import tempfile
+import unittest
+from unittest import mock
+
+from src import images
+from src.images import add_image_attributes, image_deps, image_size, page_images, process_images
+
+
+def png_header(width, height):
+    return b'\x89PNG\r\n\x1a\n' + b'\x00\x00\x00\rIHDR' + struct.pack('>II', width, height) + b'\x08\x06\x00\x00\x00'
+
+
+class TestImageSize(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def size_of(self, data):
+        path = os.path.join(self.tmp.name, "image")
+        with open(path, "wb") as f:
+            f.write(data)
+        return image_size(path)
+
+    def test_png(self):
+        self.assertEqual(self.size_of(png_header(800, 600)), (800, 600))
+
+    def test_gif(self):
+        self.assertEqual(self.size_of(b'GIF89a' + struct.pack('<HH', 32, 16) + b'\x00' * 8), (32, 16))
+
+    def test_jpeg(self):
+        exif = b'\xff\xe1' + struct.pack('>H', 10) + b'Exif\x00\x00\x00\x00'
+        frame = b'\xff\xc0' + struct.pack('>HBHH', 17, 8, 480, 640) + b'\x03' + b'\x00' * 9
+        self.assertEqual(self.size_of(b'\xff\xd8' + exif + frame), (640, 480))
+
+    def test_webp(self):
+        lossless = struct.pack('<I', (99 << 14) | 199)
+        data = b'RIFF' + b'\x00' * 4 + b'WEBPVP8L' + b'\x00' * 4 + b'\x2f' + lossless + b'\x00' * 8
+        self.assertEqual(self.size_of(data), (200, 100))
+
+    def test_unknown(self):
+        with self.assertRaises(Exception):
+            self.size_of(b'not an image at all, just some text')
+
+
+class TestProcessImages(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = os.path.join(self.tmp.name, "static")
+        self.dest = os.path.join(self.tmp.name, "docs")
+        os.makedirs(os.path.join(self.static, "images"))
+        self.write("images/cat.png", png_header(800, 600))
+        self.write("index.css", b"body {}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, rel_path, data):
+        with open(os.path.join(self.static, rel_path), "wb") as f:
+            f.write(data)
+
+    def test_sizes_are_cached(self):
+        entries, failures = process_images(self.static, self.dest, {})
+        self.assertEqual(failures, [])
+        self.assertEqual(list(entries), [os.path.join("images", "cat.png")])
+        self.assertEqual(entries[os.path.join("images", "cat.png")]['width'], 800)
+        with mock.patch.object(images, 'process_image') as process:
+            again, _ = process_images(self.static, self.dest, entries)
+        process.assert_not_called()
+        self.assertEqual(again, entries)
+
+    def test_changed_image_is_processed_again(self):
+        entries, _ = process_images(self.static, self.dest, {})
+        self.write("images/cat.png", png_header(400, 300))
+        entries, _ = process_images(self.static, self.dest, entries)
+        self.assertEqual(entries[os.path.join("images", "cat.png")]['height'], 300)
+
+    def test_broken_image_fails(self):
+        self.write("images/dog.png", b"not a png")
+        entries, failures = process_images(self.static, self.dest, {})
+        self.assertEqual(failures, [os.path.join(self.static, "images", "dog.png")])
+        self.assertNotIn(os.path.join("images", "dog.png"), entries)
+
+    def test_variants_are_resized_to_webp(self):
+        sizes = []
+
+        class FakeImage:
+            def __init__(self, size=(800, 600)):
+                self.size = size
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def resize(self, size, resample):
+                sizes.append(size)
+                return FakeImage(size)
+
+            def save(self, path, fmt, quality):
+                with open(path, "w") as f:
+                    f.write(f"{fmt} {self.size}")
+
+        pil = mock.Mock(LANCZOS=1)
+        pil.open.return_value = FakeImage()
+        self.write("images/cat.jpg", png_header(800, 600))
+        with mock.patch.object(images, 'Image', pil):
+            entries, failures = process_images(self.static, self.dest, {})
+        self.assertEqual(failures, [])
+        self.assertEqual(sizes, [(480, 360), (480, 360)])
+        png_variant = os.path.join("images", "cat.png-480w.webp")
+        jpg_variant = os.path.join("images", "cat.jpg-480w.webp")
+        self.assertEqual(entries[os.path.join("images", "cat.png")]['variants'], [[png_variant, 480]])
+        self.assertEqual(entries[os.path.join("images", "cat.jpg")]['variants'], [[jpg_variant, 480]])
+        self.assertEqual(sorted(os.listdir(os.path.join(self.dest, "images"))), ["cat.jpg-480w.webp", "cat.png-480w.webp"])
+        with open(os.path.join(self.dest, png_variant)) as f:
+            self.assertEqual(f.read(), "WEBP (480, 360)")
+
+    @unittest.skipUnless(images.Image, "Pillow is not installed")
+    def test_variants_with_pillow(self):
+        images.Image.new('RGB', (1000, 500)).save(os.path.join(self.static, "images", "wide.png"))
+        entries, failures = process_images(self.static, self.dest, {})
+        self.assertEqual(failures, [])
+        variants = entries[os.path.join("images", "wide.png")]['variants']
+        self.assertEqual([width for _, width in variants], [480, 960])
+        with images.Image.open(os.path.join(self.dest, variants[0][0])) as variant:
+            self.assertEqual((variant.format, variant.size), ('WEBP', (480, 240)))
+
+
+class TestImageAttributes(unittest.TestCase):
+    def setUp(self):
+        self.entries = {
+            os.path.join("images", "cat.png"): {
+                'width': 1200, 'height': 800,
+                'variants': [[os.path.join("images", "cat.png-480w.webp"), 480]],
+            },
+            os.path.join("images", "dog.png"): {'width': 40, 'height': 30, 'variants': []},
+        }
+
+    def test_page_images(self):
+        attrs = page_images(['/images/cat.png', '/images/dog.png', 'https://x.dev/a.png', '/'], self.entries, '/base/')
+        self.assertEqual(attrs, {
+            '/base/images/cat.png': ' width="1200" height="800" srcset="/base/images/cat.png-480w.webp 480w, '
+                                    '/base/images/cat.png 1200w" sizes="(max-width: 1200px) 100vw, 1200px"',
+            '/base/images/dog.png': ' width="40" height="30"',
+        })
+
+    def test_add_image_attributes(self):
+        html = '<p><img src="/base/images/dog.png" alt="dog"><img src="/base/other.png" alt="x"></p>'
+        attrs = page_images(['/images/dog.png'], self.entries, '/base/')
+        self.assertEqual(add_image_attributes(html, attrs),
+                         '<p><img src="/base/images/dog.png" width="40" height="30" alt="dog">'
+                         '<img src="/base/other.png" alt="x"></p>')
+
+    def test_image_deps(self):
+        deps = image_deps(['/images/dog.png', '/blog/tom'], self.entries, 'static')
+        self.assertEqual(list(deps), [os.path.join('static', 'images', 'dog.png')])
+
+
+if __name__ == "__main__":
+    unittest.main()
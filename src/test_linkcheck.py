@@ -0,0 +1,49 @@
+import os
+import unittest
+
+from src.blocks import markdown_to_html_node
+from src.linkcheck import check_links, is_internal, node_targets, resolve_url, url_key
+from src.manifest import new_manifest, record_page
+
+
+class TestLinkCheck(unittest.TestCase):
+    def test_node_targets(self):
+        md = "# Hi\n\n[home](/) and ![cat](/images/cat.png) [home](/)\n\n```\n[not](/a/link)\n```\n\n[out](https://x.dev)"
+        self.assertEqual(node_targets(markdown_to_html_node(md)), ['/', '/images/cat.png', 'https://x.dev'])
+
+    def test_is_internal(self):
+        self.assertTrue(is_internal('/blog/tom'))
+        self.assertTrue(is_internal('../tom'))
+        self.assertFalse(is_internal('https://x.dev'))
+        self.assertFalse(is_internal('mailto:me@x.dev'))
+        self.assertFalse(is_internal('//cdn.x.dev/a.js'))
+        self.assertFalse(is_internal('#top'))
+
+    def test_url_key(self):
+        keys = {url_key(path) for path in ('/blog/tom', '/blog/tom/', '/blog/tom/index.html', '/blog/tom.html')}
+        self.assertEqual(keys, {'/blog/tom'})
+        self.assertEqual(url_key('/'), url_key('/index.html'))
+
+    def test_resolve_url(self):
+        self.assertEqual(resolve_url('/blog/tom#intro', '/'), '/blog/tom')
+        self.assertEqual(resolve_url('../tom/', '/blog/majesty/'), '/blog/tom/')
+        self.assertEqual(resolve_url('cat.png?v=2', '/blog/tom/'), '/blog/tom/cat.png')
+        self.assertEqual(resolve_url('#top', '/blog/'), '/blog/')
+
+    def test_check_links(self):
+        dest = "docs"
+        manifest = new_manifest()
+        manifest['static'] = ['images/cat.png']
+        manifest['listings'] = {os.path.join(dest, 'tags', 'cats', 'index.html'): 'abc'}
+        record_page(manifest, "content/index.md", "abc", os.path.join(dest, "index.html"),
+                    targets=['/blog/tom', '/images/cat.png', '/tags/cats/', 'https://x.dev', '/images/dog.png'])
+        record_page(manifest, "content/blog/tom/index.md", "abc", os.path.join(dest, "blog", "tom", "index.html"),
+                    targets=['/', '../majesty'])
+        self.assertEqual(check_links(manifest, dest), {
+            "content/blog/tom/index.md": ['../majesty'],
+            "content/index.md": ['/images/dog.png'],
+        })
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+
+from listings import index_entry, plan_listings, write_listings
+
+
+class TestListings(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.docs = os.path.join(self.tmp.name, "docs")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        with open(self.template, "w") as f:
+            f.write("<title>{{ Title }}</title>{{ Content }}")
+        self.index = {}
+        for n in range(3):
+            self.add(f"post{n}", {'date': f"2024-01-0{n + 1}", 'tags': 'tolkien' if n else 'tolkien, tom'})
+        self.add("about", {})
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def add(self, name, meta):
+        source = os.path.join(self.content, "blog", name, "index.md")
+        output = os.path.join(self.docs, "blog", name, "index.html")
+        self.index[source] = index_entry(source, output, self.content, self.docs, meta, name.capitalize())
+
+    def read(self, *parts):
+        with open(os.path.join(self.docs, *parts)) as f:
+            return f.read()
+
+    def test_index_entry(self):
+        entry = self.index[os.path.join(self.content, "blog", "post0", "index.md")]
+        self.assertEqual(entry, {'title': 'Post0', 'url': '/blog/post0/', 'section': 'blog', 'date': '2024-01-01',
+                                 'tags': ['tolkien', 'tom']})
+
+    def test_plan_paginates_newest_first(self):
+        listings = plan_listings(self.index, self.content, self.docs, page_size=2)
+        blog = [listing for listing in listings if listing[2] == 'Blog']
+        self.assertEqual([[entry['title'] for entry in listing[3]] for listing in blog], [['Post2', 'Post1'], ['Post0']])
+        self.assertEqual(blog[1][0], os.path.join(self.docs, "blog", "page", "2", "index.html"))
+        self.assertEqual([listing[2] for listing in listings[2:]], ['Tagged tolkien', 'Tagged tolkien', 'Tagged tom'])
+
+    def test_write_listings_and_sitemap(self):
+        state = {}
+        written, failures = write_listings(self.index, state, self.content, self.template, self.docs, "/base/",
+                                           site_url="https://example.com", page_size=2)
+        self.assertEqual(failures, [])
+        self.assertEqual(len(written), 6)
+        self.assertIn('<a href="/base/blog/post2/">Post2</a> <time>2024-01-03</time>', self.read("blog", "index.html"))
+        self.assertIn('<a href="/base/blog/page/2/">Older</a>', self.read("blog", "index.html"))
+        self.assertIn("<loc>https://example.com/base/tags/tom/</loc>", self.read("sitemap.xml"))
+
+        written, _ = write_listings(self.index, state, self.content, self.template, self.docs, "/base/",
+                                    site_url="https://example.com", page_size=2)
+        self.assertEqual(written, [])
+
+        del self.index[os.path.join(self.content, "blog", "post0", "index.md")]
+        written, _ = write_listings(self.index, state, self.content, self.template, self.docs, "/base/",
+                                    site_url="https://example.com", page_size=2)
+        self.assertEqual(sorted(written), [os.path.join(self.docs, "blog", "index.html"),
+                                           os.path.join(self.docs, "sitemap.xml"),
+                                           os.path.join(self.docs, "tags", "tolkien", "index.html")])
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "tags", "tom")))
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "blog", "page")))
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "tags", "tolkien", "page")))
+
+
+if __name__ == "__main__":
+    unittest.main()
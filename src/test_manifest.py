@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+
+from manifest import new_manifest, load_manifest, save_manifest, update_inputs, record_page, \
+    prune_pages
+
+
+class TestManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_load_missing_manifest(self):
+        manifest = load_manifest(os.path.join(self.dir, "missing.json"))
+        self.assertEqual(manifest, new_manifest())
+
+    def test_save_and_load_roundtrip(self):
+        path = os.path.join(self.dir, "manifest.json")
+        manifest = new_manifest()
+        record_page(manifest, "content/index.md", "abc", "docs/index.html")
+        save_manifest(path, manifest)
+        self.assertEqual(load_manifest(path), manifest)
+
+    def test_basepath_change_invalidates_pages(self):
+        output = os.path.join(self.dir, "index.html")
+        open(output, "w").close()
+        manifest = new_manifest()
+        update_inputs(manifest, "/")
+        record_page(manifest, "content/index.md", "abc", output)
+        update_inputs(manifest, "/")
+        self.assertEqual(manifest['pages']["content/index.md"]['hash'], "abc")
+        update_inputs(manifest, "/other/")
+        self.assertIsNone(manifest['pages']["content/index.md"]['hash'])
+
+    def test_prune_removes_deleted_sources(self):
+        page_dir = os.path.join(self.dir, "blog", "tom")
+        os.makedirs(page_dir)
+        output = os.path.join(page_dir, "index.html")
+        open(output, "w").close()
+        manifest = new_manifest()
+        record_page(manifest, "content/blog/tom/index.md", "abc", output)
+        removed = prune_pages(manifest, set(), self.dir)
+        self.assertEqual(removed, [output])
+        self.assertEqual(manifest['pages'], {})
+        self.assertFalse(os.path.exists(os.path.join(self.dir, "blog")))
+        self.assertTrue(os.path.exists(self.dir))
+
+
+if __name__ == "__main__":
+    unittest.main()
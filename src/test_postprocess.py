@@ -0,0 +1,52 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+from postprocess import compress_file, compress_tree, minify_css, minify_html, remove_compressed
+
+
+class TestMinify(unittest.TestCase):
+    def test_minify_html(self):
+        html = "<html>\n<head>\n    <title> A  page </title>\n</head>\n<body>\n<!-- note -->\n" \
+               "<p>some <b>bold</b>  text\n  here </p>\n</body>\n</html>\n"
+        self.assertEqual(minify_html(html),
+                         "<html><head><title>A page</title></head><body><p>some <b>bold</b> text here</p></body></html>")
+
+    def test_pre_and_code_are_left_alone(self):
+        html = "<div>\n<pre><code>def f():\n    return  1\n</code></pre>\n<p>use <code>a  b</code> here</p>\n</div>"
+        self.assertEqual(minify_html(html),
+                         "<div><pre><code>def f():\n    return  1\n</code></pre><p>use <code>a  b</code> here</p></div>")
+
+    def test_conditional_comments_are_kept(self):
+        self.assertEqual(minify_html("<!--[if IE]><p>x</p><![endif]-->"), "<!--[if IE]><p>x</p><![endif]-->")
+
+    def test_minify_css(self):
+        css = '/* theme */\nbody {\n    font-family: "A  B", serif;\n    margin: 0;\n}\n\nh1,\nh2 > a:hover {\n    color: red;\n}\n'
+        self.assertEqual(minify_css(css), 'body{font-family:"A  B",serif;margin:0}h1,h2>a:hover{color:red}')
+
+
+class TestCompress(unittest.TestCase):
+    def test_compress_tree(self):
+        with tempfile.TemporaryDirectory() as root:
+            page = os.path.join(root, "index.html")
+            with open(page, "w") as f:
+                f.write("<p>hello</p>" * 100)
+            with open(os.path.join(root, "tiny.css"), "w") as f:
+                f.write("a{}")
+            with open(os.path.join(root, "gone.html.gz"), "wb") as f:
+                f.write(b"")
+            self.assertEqual(compress_tree(root, use_brotli=False), [])
+            self.assertEqual(sorted(os.listdir(root)), ["index.html", "index.html.gz", "tiny.css"])
+            with gzip.open(page + ".gz", "rt") as f:
+                self.assertEqual(f.read(), "<p>hello</p>" * 100)
+            # current siblings are skipped until the output changes
+            self.assertEqual(compress_file(page, use_brotli=False), [])
+            os.utime(page, ns=(0, 0))
+            self.assertEqual(compress_file(page, use_brotli=False), [page + ".gz"])
+            self.assertEqual(remove_compressed(root), 1)
+            self.assertEqual(sorted(os.listdir(root)), ["index.html", "tiny.css"])
+
+
+if __name__ == "__main__":
+    unittest.main()
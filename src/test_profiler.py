@@ -0,0 +1,71 @@
+import json
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from profiler import NULL_PROFILER, Profiler
+
+
+class TestProfiler(unittest.TestCase):
+    def profile(self):
+        profiler = Profiler()
+        for page, loops in (("slow.md", 20000), ("fast.md", 10)):
+            with profiler.stage("parse", page):
+                [str(n) for n in range(loops)]
+            with profiler.stage("write", page):
+                pass
+        with profiler.stage("static"):
+            pass
+        return profiler
+
+    def test_stage_totals(self):
+        totals = self.profile().stage_totals()
+        self.assertEqual({stage: total[0] for stage, total in totals.items()}, {"parse": 2, "write": 2, "static": 1})
+
+    def test_report_lists_slowest_pages_first(self):
+        report = self.profile().report(top=1)
+        self.assertIn("Stage breakdown:", report)
+        self.assertIn("slow.md", report)
+        self.assertNotIn("fast.md", report)
+
+    def test_merge_records(self):
+        profiler = Profiler()
+        profiler.merge(self.profile().records)
+        self.assertEqual(len(profiler.records), 5)
+
+    def test_write_trace(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "trace.json")
+            self.profile().write_trace(path)
+            with open(path) as f:
+                events = json.load(f)["traceEvents"]
+        self.assertEqual(len(events), 5)
+        self.assertEqual(events[0]["ph"], "X")
+        self.assertEqual(events[0]["args"]["page"], "slow.md")
+
+    def test_trace_has_a_track_per_thread(self):
+        profiler = Profiler()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(self.run_stage, profiler, "read").result()
+        self.run_stage(profiler, "parse")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "trace.json")
+            profiler.write_trace(path)
+            with open(path) as f:
+                events = json.load(f)["traceEvents"]
+        self.assertEqual(len({event["pid"] for event in events}), 1)
+        self.assertEqual(len({event["tid"] for event in events}), 2)
+
+    def run_stage(self, profiler, name):
+        with profiler.stage(name, "a.md"):
+            pass
+
+    def test_null_profiler(self):
+        with NULL_PROFILER.stage("parse", "page.md"):
+            pass
+        self.assertEqual(len(NULL_PROFILER.records), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import serve
+from serve import DevServer, InotifyWatcher, PollingWatcher
+
+
+class TestDevServer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.content = os.path.join(root, "content")
+        self.static = os.path.join(root, "static")
+        self.docs = os.path.join(root, "docs")
+        self.template = self.write(os.path.join(root, "template.html"), "<title>{{ Title }}</title>{{ Content }}")
+        self.page = self.write(os.path.join(self.content, "blog", "tom", "index.md"), "# Tom\n\nfirst")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nhello")
+        self.write(os.path.join(self.static, "index.css"), "body {}")
+        self.server = DevServer(self.content, self.static, self.template, self.docs, "/")
+        self.server.build_all()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, contents):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(contents)
+        return path
+
+    def read(self, *parts):
+        with open(os.path.join(self.docs, *parts)) as f:
+            return f.read()
+
+    def test_build_all(self):
+        self.assertEqual(self.read("blog", "tom", "index.html"), "<title>Tom</title><div><h1>Tom</h1><p>first</p></div>")
+        self.assertEqual(self.read("index.css"), "body {}")
+
+    def test_rebuild_only_touched_page(self):
+        self.write(self.page, "# Tom\n\nsecond")
+        self.assertEqual(self.server.rebuild({self.page}), [self.page])
+        self.assertEqual(self.read("blog", "tom", "index.html"), "<title>Tom</title><div><h1>Tom</h1><p>second</p></div>")
+        self.assertEqual(self.server.rebuild({self.page}), [])
+
+    def test_deleted_page_is_removed(self):
+        os.remove(self.page)
+        self.server.rebuild({self.page})
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "blog")))
+
+    def test_static_change_is_synced(self):
+        css = self.write(os.path.join(self.static, "index.css"), "body { margin: 0 }")
+        self.server.rebuild({css})
+        self.assertEqual(self.read("index.css"), "body { margin: 0 }")
+
+    def test_template_change_rebuilds_every_page(self):
+        self.write(self.template, "<h1>{{ Title }}</h1>")
+        stat = os.stat(self.template)
+        os.utime(self.template, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        self.assertEqual(len(self.server.rebuild({self.template})), 2)
+        self.assertEqual(self.read("index.html"), "<h1>Home</h1>")
+
+    def test_section_template_rebuilds_only_its_pages(self):
+        section = self.write(os.path.join(os.path.dirname(self.template), "templates", "blog.html"), "{{ Title }}")
+        self.assertEqual(self.server.rebuild({section}), [self.page])
+        self.assertEqual(self.read("blog", "tom", "index.html"), "Tom")
+
+    def test_listings_follow_page_edits(self):
+        self.write(self.page, "---\ndate: 2024-01-02\ntags: x\n---\n# Tom\n\nfirst")
+        self.server.rebuild({self.page})
+        self.assertIn('<a href="/blog/tom/">Tom</a> <time>2024-01-02</time>', self.read("blog", "index.html"))
+        self.assertIn("Tom", self.read("tags", "x", "index.html"))
+        self.write(self.page, "# Tom\n\nundated")
+        self.server.rebuild({self.page})
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "tags")))
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "blog", "index.html")))
+
+    def test_build_all_writes_listings(self):
+        post = self.write(os.path.join(self.content, "blog", "a", "index.md"), "---\ndate: 2024\ntags: x\n---\n# A\n")
+        server = DevServer(self.content, self.static, self.template, self.docs, "/", "https://example.com")
+        server.build_all()
+        self.assertIn('<a href="/blog/a/">A</a>', self.read("blog", "index.html"))
+        self.assertIn("<loc>https://example.com/blog/a/</loc>", self.read("sitemap.xml"))
+        os.remove(post)
+        server.rebuild({post})
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "blog", "index.html")))
+
+    def test_page_edit_does_not_look_up_other_templates(self):
+        self.write(self.page, "# Tom\n\nsecond")
+        with mock.patch.object(serve, "find_template", wraps=serve.find_template) as find:
+            self.server.rebuild({self.page})
+        # only for the edited page itself
+        self.assertEqual(find.call_count, 1)
+
+    def test_section_template_does_not_read_other_pages(self):
+        section = self.write(os.path.join(os.path.dirname(self.template), "templates", "blog.html"), "{{ Title }}")
+        with mock.patch("builtins.open", wraps=open) as opened:
+            self.server.rebuild({section})
+        # the template name kept from the last render is used, the page is not read
+        self.assertNotIn(os.path.join(self.content, "index.md"), [call.args[0] for call in opened.call_args_list])
+
+    def test_bad_pages_do_not_stop_rebuild(self):
+        bad = self.write(os.path.join(self.content, "bad.md"), "---\njust a string\n---\n# Bad\n")
+        with open(os.path.join(self.content, "latin1.md"), "wb") as f:
+            f.write(b"# Caf\xe9\n")
+        self.write(self.page, "# Tom\n\nsecond")
+        changed = {bad, os.path.join(self.content, "latin1.md"), self.page}
+        with self.assertLogs("serve", "ERROR") as logs:
+            self.assertEqual(self.server.rebuild(changed), [self.page])
+        self.assertEqual(len(logs.output), 2)
+
+
+class TestWatchers(unittest.TestCase):
+    def check_watcher(self, watcher_class):
+        with tempfile.TemporaryDirectory() as tmp:
+            template = os.path.join(tmp, "template.html")
+            open(template, "w").close()
+            os.makedirs(os.path.join(tmp, "content"))
+            watcher = watcher_class([os.path.join(tmp, "content"), template])
+            try:
+                page = os.path.join(tmp, "content", "index.md")
+                with open(page, "w") as f:
+                    f.write("# Home")
+                self.assertIn(page, watcher.wait(timeout=2))
+                os.makedirs(os.path.join(tmp, "content", "blog"))
+                watcher.wait(timeout=0.2)
+                post = os.path.join(tmp, "content", "blog", "index.md")
+                with open(post, "w") as f:
+                    f.write("# Post")
+                self.assertIn(post, watcher.wait(timeout=2))
+                with open(template, "w") as f:
+                    f.write("{{ Content }}")
+                self.assertIn(template, watcher.wait(timeout=2))
+            finally:
+                watcher.close()
+
+    def test_polling_watcher(self):
+        self.check_watcher(lambda paths: PollingWatcher(paths, interval=0.01))
+
+    def test_inotify_watcher(self):
+        try:
+            InotifyWatcher([]).close()
+        except OSError:
+            self.skipTest("inotify is not available")
+        self.check_watcher(InotifyWatcher)
+
+
+if __name__ == "__main__":
+    unittest.main()
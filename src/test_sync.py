@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+
+from sync import sync_static_files
+
+
+class TestSyncStaticFiles(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self.tmp.name, "static")
+        self.dst = os.path.join(self.tmp.name, "docs")
+        self.write(self.src, "index.css", "body {}")
+        self.write(self.src, "images/tom.png", "png bytes")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, root, name, contents):
+        path = os.path.join(root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(contents)
+        return path
+
+    def read(self, name):
+        with open(os.path.join(self.dst, name)) as f:
+            return f.read()
+
+    def test_initial_sync_copies_everything(self):
+        files, failures = sync_static_files(self.src, self.dst)
+        self.assertEqual(files, ["images/tom.png", "index.css"])
+        self.assertEqual(failures, [])
+        self.assertEqual(self.read("images/tom.png"), "png bytes")
+
+    def test_minify_css(self):
+        self.write(self.src, "index.css", "body {\n    margin: 0;\n}\n")
+        sync_static_files(self.src, self.dst, hardlink=True, minify=True)
+        self.assertEqual(self.read("index.css"), "body{margin:0}")
+        inode = os.stat(os.path.join(self.dst, "index.css")).st_ino
+        sync_static_files(self.src, self.dst, minify=True)
+        self.assertEqual(os.stat(os.path.join(self.dst, "index.css")).st_ino, inode)
+        sync_static_files(self.src, self.dst)
+        self.assertEqual(self.read("index.css"), "body {\n    margin: 0;\n}\n")
+
+    def test_unchanged_files_are_not_rewritten(self):
+        sync_static_files(self.src, self.dst)
+        dst_path = os.path.join(self.dst, "index.css")
+        os.utime(dst_path, ns=(0, os.stat(os.path.join(self.src, "index.css")).st_mtime_ns))
+        inode = os.stat(dst_path).st_ino
+        sync_static_files(self.src, self.dst)
+        self.assertEqual(os.stat(dst_path).st_ino, inode)
+
+    def test_changed_files_are_copied(self):
+        sync_static_files(self.src, self.dst)
+        self.write(self.src, "index.css", "body { color: red }")
+        sync_static_files(self.src, self.dst)
+        self.assertEqual(self.read("index.css"), "body { color: red }")
+
+    def test_hash_mode_catches_same_size_edits(self):
+        sync_static_files(self.src, self.dst)
+        dst_path = os.path.join(self.dst, "index.css")
+        with open(dst_path, "w") as f:
+            f.write("bodx {}")
+        st = os.stat(os.path.join(self.src, "index.css"))
+        os.utime(dst_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+        sync_static_files(self.src, self.dst)
+        self.assertEqual(self.read("index.css"), "bodx {}")
+        sync_static_files(self.src, self.dst, use_hash=True)
+        self.assertEqual(self.read("index.css"), "body {}")
+
+    def test_removed_files_are_pruned(self):
+        files, _ = sync_static_files(self.src, self.dst)
+        self.write(self.dst, "index.html", "generated page")
+        os.remove(os.path.join(self.src, "images/tom.png"))
+        sync_static_files(self.src, self.dst, files)
+        self.assertFalse(os.path.exists(os.path.join(self.dst, "images")))
+        self.assertEqual(self.read("index.html"), "generated page")
+
+    def test_hardlink_does_not_write_through(self):
+        sync_static_files(self.src, self.dst, hardlink=True)
+        src_path = os.path.join(self.src, "index.css")
+        self.assertTrue(os.path.samefile(src_path, os.path.join(self.dst, "index.css")))
+        os.remove(src_path)
+        self.write(self.src, "index.css", "body { margin: 0 }")
+        sync_static_files(self.src, self.dst, hardlink=True)
+        self.assertEqual(self.read("index.css"), "body { margin: 0 }")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+import tempfile
+import unittest
+
+from htmlnode import LeafNode, ParentNode
+from template import Template, find_template, load_template, rewrite_links
+
+
+class TestTemplate(unittest.TestCase):
+    def test_compiles_literals_and_placeholders(self):
+        template = Template("<title>{{ Title }}</title>{{Content}}!")
+        self.assertEqual(template.placeholders, ["Title", "Content"])
+        self.assertEqual(len(template.segments), 5)
+
+    def test_render_arbitrary_placeholders(self):
+        template = Template("{{ Title }} by {{ Author }} on {{ Date }}")
+        html = template.render({"Title": "Tom", "Author": "Archmage", "Date": "today"})
+        self.assertEqual(html, "Tom by Archmage on today")
+
+    def test_unknown_placeholder_is_left_alone(self):
+        template = Template("<p>{{ Missing }}</p>")
+        self.assertEqual(template.render({}), "<p>{{ Missing }}</p>")
+
+    def test_streams_node_content(self):
+        template = Template('<article>{{ Content }}</article>')
+        node = ParentNode("p", [LeafNode("a", "home", props={"href": "/"})])
+        self.assertEqual(template.render({"Content": node}), '<article><p><a href="/">home</a></p></article>')
+
+    def test_basepath_rewrites_template_and_content_links(self):
+        template = Template('<link href="/index.css" /><img src="/a.png" />{{ Content }}', "/site/")
+        self.assertIn('href="/site/index.css"', template.segments[0][0])
+        html = template.render({"Content": '<a href="/blog">blog</a><a href="https://x.org/">x</a>'})
+        self.assertEqual(html, '<link href="/site/index.css" /><img src="/site/a.png" />'
+                               '<a href="/site/blog">blog</a><a href="https://x.org/">x</a>')
+
+    def test_rewrite_links_matches_chained_replace(self):
+        html = '<a href="/">a</a><img src="/i.png"/><a href="rel">b</a>'
+        basepath = "/bootdev-ssg/"
+        expected = html.replace('href="/', f'href="{basepath}').replace('src="/', f'src="{basepath}')
+        self.assertEqual(rewrite_links(html, basepath), expected)
+        self.assertEqual(rewrite_links(html, "/"), html)
+        self.assertEqual(rewrite_links('<a href="/">', "\\odd\\"), '<a href="\\odd\\">')
+
+    def test_load_template_is_cached_until_modified(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "template.html")
+            with open(path, "w") as f:
+                f.write("{{ Title }}")
+            first = load_template(path, "/")
+            self.assertIs(load_template(path, "/"), first)
+            self.assertIsNot(load_template(path, "/other/"), first)
+            with open(path, "w") as f:
+                f.write("<h1>{{ Title }}</h1>")
+            stat = os.stat(path)
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+            self.assertEqual(load_template(path, "/").render({"Title": "x"}), "<h1>x</h1>")
+
+    def write(self, path, contents):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(contents)
+        return path
+
+    def test_partials_are_included_relative_to_the_includer(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = self.write(os.path.join(tmp, "template.html"), '{{> partials/head.html }}{{ Content }}')
+            head = self.write(os.path.join(tmp, "partials", "head.html"), '<title>{{ Title }}</title>{{>nav.html}}')
+            nav = self.write(os.path.join(tmp, "partials", "nav.html"), '<a href="/">home</a>')
+            template = load_template(path, "/base/")
+            self.assertEqual(template.files, [path, head, nav])
+            self.assertEqual(template.render({"Title": "x", "Content": "y"}),
+                             '<title>x</title><a href="/base/">home</a>y')
+            self.write(nav, '<nav></nav>')
+            stat = os.stat(nav)
+            os.utime(nav, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+            self.assertEqual(load_template(path, "/base/").render({"Title": "x", "Content": "y"}),
+                             '<title>x</title><nav></nav>y')
+
+    def test_include_cycle_raises(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = self.write(os.path.join(tmp, "a.html"), '{{> b.html }}')
+            self.write(os.path.join(tmp, "b.html"), '{{> a.html }}')
+            with self.assertRaises(Exception):
+                load_template(path)
+
+    def test_find_template_uses_section_template(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            default = self.write(os.path.join(tmp, "template.html"), "")
+            blog = self.write(os.path.join(tmp, "templates", "blog.html"), "")
+            content = os.path.join(tmp, "content")
+            self.assertEqual(find_template(os.path.join(content, "blog", "tom", "index.md"), content, default), blog)
+            self.assertEqual(find_template(os.path.join(content, "contact", "index.md"), content, default), default)
+            self.assertEqual(find_template(os.path.join(content, "index.md"), content, default), default)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,26 @@
 import unittest
 
+import glob
+import os
+
+from blocks import markdown_to_blocks
 from textnode import TextNode, TextType, text_node_to_html_node, split_nodes_delimiter, extract_markdown_images, \
-    extract_markdown_links, text_to_textnodes
+    extract_markdown_links, text_to_textnodes, split_nodes_image, split_nodes_link, split_nodes_quotes
+
+CONTENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'content')
+
+
+def chained_text_to_textnodes(text):
+    if text == "":
+        return [TextNode("", text_type=TextType.TEXT)]
+    nodes = [TextNode(text, text_type=TextType.TEXT)]
+    nodes = split_nodes_image(nodes)
+    nodes = split_nodes_link(nodes)
+    nodes = split_nodes_quotes(nodes)
+    nodes = split_nodes_delimiter(nodes, '**', TextType.BOLD)
+    nodes = split_nodes_delimiter(nodes, '_', TextType.ITALIC)
+    nodes = split_nodes_delimiter(nodes, '`', TextType.CODE)
+    return nodes
 
 
 class TestTextNode(unittest.TestCase):
@@ -15,6 +34,11 @@ class TestTextNode(unittest.TestCase):
         different_node = TextNode("This is a text node", TextType.LINK, "https://example.com")
         self.assertNotEqual(node, different_node)
 
+    def test_repr(self):
+        node = TextNode("home", TextType.LINK, "/")
+        self.assertEqual(repr(node), "TextNode(text=home, text_type=link, url=/)")
+        self.assertFalse(hasattr(node, "__dict__"))
+
     def test_url_is_none(self):
         node = TextNode("This is a text node", TextType.BOLD)
         self.assertEqual(node.url, None)
@@ -90,6 +114,60 @@ class TestTextNode(unittest.TestCase):
         expected = [TextNode("", TextType.TEXT)]
         assert result == expected
 
+    def test_text_to_textnodes_all_types(self):
+        result = text_to_textnodes(
+            "This is **text** with an _italic_ word and a `code block` and an "
+            "![obi wan image](https://i.imgur.com/fJRm4Vk.jpeg) and a [link](https://boot.dev)"
+        )
+        self.assertListEqual([
+            TextNode("This is ", TextType.TEXT),
+            TextNode("text", TextType.BOLD),
+            TextNode(" with an ", TextType.TEXT),
+            TextNode("italic", TextType.ITALIC),
+            TextNode(" word and a ", TextType.TEXT),
+            TextNode("code block", TextType.CODE),
+            TextNode(" and an ", TextType.TEXT),
+            TextNode("obi wan image", TextType.IMAGE, "https://i.imgur.com/fJRm4Vk.jpeg"),
+            TextNode(" and a ", TextType.TEXT),
+            TextNode("link", TextType.LINK, "https://boot.dev"),
+        ], result)
+
+    def test_text_to_textnodes_matches_chained_passes(self):
+        samples = [
+            "plain text",
+            "![a](b)",
+            "![a](b)![c](d) tail",
+            "[a](b)[c](d)",
+            "x [a] y [b](c) z",
+            "![img](/i.png) then [link](/) with **bold [inside](/x)** end",
+            "> quoted **line**\nplain _line_\n> another",
+            "before [link](/) > not a quote\n> quote",
+            "**bold**_italic_`code`",
+            "a **b _c_ d** e `f_g_h`",
+            "![](empty) [](empty)",
+            "a\n>b\n>\nc",
+            "a > b",
+            "x] (y [z]",
+            "tail ![a](b",
+            "only ](",
+            "!not an image",
+        ]
+        for path in glob.glob(os.path.join(CONTENT_DIR, '**', '*.md'), recursive=True):
+            with open(path, encoding="utf-8") as f:
+                samples.extend(markdown_to_blocks(f.read()))
+        for text in samples:
+            try:
+                expected = chained_text_to_textnodes(text)
+            except Exception:
+                with self.assertRaises(Exception):
+                    text_to_textnodes(text)
+                continue
+            self.assertListEqual(expected, text_to_textnodes(text), text)
+
+    def test_text_to_textnodes_missing_delimiter(self):
+        with self.assertRaises(Exception):
+            text_to_textnodes("an [ok](/) link and **unclosed bold")
+
 
 if __name__ == "__main__":
     unittest.main()
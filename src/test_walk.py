@@ -0,0 +1,48 @@
+import os
+import tempfile
+import unittest
+
+from walk import iter_tree, scan_tree
+
+
+class TestWalk(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        for name, contents in (("b.md", "bb"), ("a.css", "a"), (os.path.join("z", "index.md"), "zzz"),
+                               (os.path.join("c", "d", "index.md"), ""), (os.path.join("c", "x.md"), "x")):
+            path = os.path.join(self.root, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(contents)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_walk_order_is_fixed(self):
+        self.assertEqual([rel_path for rel_path, _ in iter_tree(self.root)],
+                         ["a.css", "b.md", os.path.join("c", "x.md"), os.path.join("c", "d", "index.md"),
+                          os.path.join("z", "index.md")])
+
+    def test_scan_tree_filters_by_suffix(self):
+        stat = os.stat(os.path.join(self.root, "b.md"))
+        entries = scan_tree(self.root, ".md")
+        self.assertEqual(entries[0], ("b.md", 2, stat.st_mtime_ns))
+        self.assertEqual(len(entries), 4)
+
+    def test_directory_symlinks_are_followed(self):
+        os.symlink(os.path.join(self.root, "c"), os.path.join(self.root, "link"))
+        self.assertIn(os.path.join("link", "d", "index.md"), dict(iter_tree(self.root)))
+
+    def test_symlink_cycles_are_skipped(self):
+        os.symlink(self.root, os.path.join(self.root, "c", "d", "up"))
+        with self.assertLogs("walk", "WARNING"):
+            paths = [rel_path for rel_path, _ in iter_tree(self.root)]
+        self.assertEqual(len(paths), 5)
+
+    def test_missing_root(self):
+        self.assertEqual(scan_tree(os.path.join(self.root, "missing")), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import os
+import tempfile
+import unittest
+
+from src.website import Site
+
+
+class TestSite(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.static = os.path.join(self.root, "static")
+        self.dest = os.path.join(self.root, "docs")
+        self.template = os.path.join(self.root, "template.html")
+        self.write(self.template, '<title>{{ Title }}</title><a href="/">home</a>{{ Content }}')
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nWelcome **home**\n")
+        self.write(os.path.join(self.content, "blog", "post", "index.md"), "# Post\n\nA post\n")
+        self.write(os.path.join(self.static, "index.css"), "body { color: red; }\n")
+        self.site = Site(self.content, self.static, self.dest, self.template, '/base/',
+                         os.path.join(self.root, "manifest.json"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def test_render_string(self):
+        html = self.site.render_string("# Hi\n\nSome _text_\n")
+        self.assertEqual(html, '<title>Hi</title><a href="/base/">home</a>'
+                               '<div><h1>Hi</h1><p>Some <i>text</i></p></div>')
+
+    def test_render_page_matches_build(self):
+        copy_failures, failures, compress_failures = self.site.build()
+        self.assertEqual((copy_failures, failures, compress_failures), ([], [], []))
+        self.assertEqual(self.site.render_page("index.md"), self.read(os.path.join(self.dest, "index.html")))
+        self.assertEqual(self.site.render_page(os.path.join("blog", "post", "index.md")),
+                         self.read(os.path.join(self.dest, "blog", "post", "index.html")))
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "index.css")))
+
+    def test_section_template(self):
+        self.write(os.path.join(self.root, "templates", "blog.html"), '<article>{{ Content }}</article>')
+        html = self.site.render_page(os.path.join("blog", "post", "index.md"))
+        self.assertTrue(html.startswith('<article>'))
+        self.assertTrue(self.site.render_page("index.md").startswith('<title>'))
+
+    def test_front_matter_template(self):
+        self.write(os.path.join(self.root, "templates", "bare.html"), '{{ Content }}')
+        self.assertEqual(self.site.render_string("---\ntemplate: bare\n---\n# Hi\n"), '<div><h1>Hi</h1></div>')
+
+    def test_template_cached_until_reload(self):
+        self.site.render_string("# Hi")
+        self.write(self.template, '<b>{{ Title }}</b>')
+        self.assertTrue(self.site.render_string("# Hi").startswith('<title>'))
+        self.site.reload()
+        self.assertEqual(self.site.render_string("# Hi"), '<b>Hi</b>')
+
+    def test_minify(self):
+        self.site.minify = True
+        self.assertEqual(self.site.render_string("# Hi\n\nSome   text\n"),
+                         '<title>Hi</title><a href="/base/">home</a><div><h1>Hi</h1><p>Some text</p></div>')
+
+    def test_incremental_build_skips_current_pages(self):
+        self.site.build()
+        output = os.path.join(self.dest, "index.html")
+        mtime = os.stat(output).st_mtime_ns
+        self.assertEqual(self.site.build(incremental=True), ([], [], []))
+        self.assertEqual(os.stat(output).st_mtime_ns, mtime)
+
+    def test_dropping_compress_removes_siblings(self):
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\n" + "Welcome **home**\n" * 50)
+        self.site.build(compress=True)
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "index.html.gz")))
+        self.site.build(incremental=True)
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "index.html.gz")))
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "index.html")))
+
+    def test_precompressed_static_files_are_kept(self):
+        data = os.path.join(self.static, "data.json.gz")
+        with open(data, "wb") as f:
+            f.write(b"not a sibling")
+        self.write(os.path.join(self.static, "app.js"), "let x = 1;\n" * 200)
+        self.write(os.path.join(self.static, "app.js.gz"), "hand made")
+        self.site.build(compress=True)
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "data.json.gz")))
+        self.assertEqual(self.read(os.path.join(self.dest, "app.js.gz")), "hand made")
+        self.site.build(incremental=True)
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "data.json.gz")))
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "app.js.gz")))
+
+    def test_build_reports_broken_links(self):
+        source = os.path.join(self.content, "blog", "post", "index.md")
+        self.write(source, "# Post\n\n[home](/) [css](/index.css) [gone](/blog/gone)\n")
+        self.site.build()
+        self.assertEqual(self.site.broken_links, {source: ['/blog/gone']})
+        self.write(os.path.join(self.content, "blog", "gone", "index.md"), "# Gone\n")
+        self.site.build(incremental=True)
+        self.assertEqual(self.site.broken_links, {})
+
+    def test_images(self):
+        with open(os.path.join(self.static, "cat.png"), "wb") as f:
+            f.write(b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x40\x00\x00\x00\x20')
+        source = os.path.join("blog", "post", "index.md")
+        self.write(os.path.join(self.content, source), "# Post\n\n![cat](/cat.png)\n")
+        self.site.images = True
+        self.site.build()
+        html = self.read(os.path.join(self.dest, "blog", "post", "index.html"))
+        self.assertIn('<img src="/base/cat.png" width="64" height="32" alt="cat">', html)
+        self.assertEqual(self.site.render_page(source), html)
+
+
+if __name__ == "__main__":
+    unittest.main()
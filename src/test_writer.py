@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from writer import OutputFile, WriteQueue, make_dirs, read_ahead, write_if_changed, write_text
+
+
+class TestWriter(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_make_dirs(self):
+        paths = [os.path.join(self.dir, "a", "b", "index.html"), os.path.join(self.dir, "a", "b", "other.html"),
+                 os.path.join(self.dir, "c", "index.html")]
+        self.assertEqual(make_dirs(paths), 2)
+        self.assertTrue(os.path.isdir(os.path.join(self.dir, "a", "b")))
+        self.assertEqual(make_dirs(paths), 0)
+
+    def test_unchanged_output_keeps_its_mtime(self):
+        path = os.path.join(self.dir, "index.html")
+        self.assertTrue(write_if_changed(path, "<p>é</p>"))
+        os.utime(path, ns=(0, 0))
+        self.assertFalse(write_if_changed(path, "<p>é</p>"))
+        self.assertEqual(os.stat(path).st_mtime_ns, 0)
+        self.assertTrue(write_if_changed(path, "<p>e!</p>"))
+        with open(path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), "<p>e!</p>")
+
+    def test_known_hash_is_trusted(self):
+        path = os.path.join(self.dir, "index.html")
+        _, digest = write_text(path, "<p>a</p>")
+        with open(path, "w") as f:
+            f.write("<p>b</p>")
+        # same size and the recorded hash matches, so the file is not read back
+        self.assertEqual(write_text(path, "<p>a</p>", known=digest), (False, digest))
+        self.assertTrue(write_if_changed(path, "<p>a</p>"))
+
+    def test_output_file_only_replaces_changed_outputs(self):
+        path = os.path.join(self.dir, "index.html")
+        with OutputFile(path) as f:
+            f.writelines(["<p>", "é", "</p>"])
+        self.assertTrue(f.written)
+        os.utime(path, ns=(0, 0))
+        with OutputFile(path, known=f.digest) as again:
+            again.write("<p>é</p>")
+        self.assertFalse(again.written)
+        self.assertEqual(again.digest, f.digest)
+        self.assertEqual(os.stat(path).st_mtime_ns, 0)
+        self.assertEqual(os.listdir(self.dir), ["index.html"])
+        with self.assertRaises(ValueError):
+            with OutputFile(path) as broken:
+                broken.write("<p>half")
+                raise ValueError
+        with open(path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), "<p>é</p>")
+        self.assertEqual(os.listdir(self.dir), ["index.html"])
+
+    def test_read_ahead_is_bounded(self):
+        taken = []
+
+        def items():
+            for n in range(10):
+                taken.append(n)
+                yield n
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = read_ahead(executor, lambda n: n * 2, items(), 3)
+            self.assertEqual(next(results), (0, 0))
+            self.assertEqual(len(taken), 3)
+            self.assertEqual([result for _, result in results], [2 * n for n in range(1, 10)])
+
+    def test_write_queue_reports_errors_per_file(self):
+        with WriteQueue(threads=2, max_pending=1) as queue:
+            futures = [queue.submit(os.path.join(self.dir, f"{n}.html"), str(n)) for n in range(5)]
+            missing = queue.submit(os.path.join(self.dir, "missing", "index.html"), "x")
+        self.assertEqual([future.result()[0] for future in futures], [True] * 5)
+        self.assertIsInstance(missing.exception(), FileNotFoundError)
+
+
+if __name__ == "__main__":
+    unittest.main()
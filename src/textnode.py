@@ -13,7 +13,15 @@ class TextType(Enum):
     IMAGE = "image"
 
 
+INLINE_DELIMITERS = (('**', TextType.BOLD), ('_', TextType.ITALIC), ('`', TextType.CODE))
+IMAGE_PATTERN = re.compile(r"!\[(.*?)\]\((.*?)\)")
+LINK_PATTERN = re.compile(r"\[(.*?)\]\((.*?)\)")
+
+
 class TextNode:
+    # text_type is always one of the TextType singletons, so it is shared already
+    __slots__ = ('text', 'text_type', 'url')
+
     def __init__(self, text, text_type, url=None):
         self.text = text
         self.text_type = text_type
@@ -26,14 +34,22 @@ class TextNode:
         return f"TextNode(text={self.text}, text_type={self.text_type.value}, url={self.url})"
 
 
+def is_plain_text(text):
+    # True when text holds none of the characters any inline syntax starts
+    # with. A few substring scans are much cheaper than any regex search.
+    return '[' not in text and '*' not in text and '_' not in text and '`' not in text and '>' not in text
+
+
 def extract_markdown_images(text):
-    matches = re.findall(r"!\[(.*?)\]\((.*?)\)", text)
-    return matches
+    if '![' not in text:
+        return []
+    return IMAGE_PATTERN.findall(text)
 
 
 def extract_markdown_links(text):
-    matches = re.findall(r"\[(.*?)\]\((.*?)\)", text)
-    return matches
+    if '](' not in text:
+        return []
+    return LINK_PATTERN.findall(text)
 
 
 def text_node_to_html_node(text_node):
@@ -149,14 +165,74 @@ def split_nodes_quotes(nodes):
 
 
 def text_to_textnodes(text):
-    if text == "":
-        return [TextNode("", text_type=TextType.TEXT)]
-
-    nodes = [TextNode(text, text_type=TextType.TEXT)]
-    nodes = split_nodes_image(nodes)
-    nodes = split_nodes_link(nodes)
-    nodes = split_nodes_quotes(nodes)
-    nodes = split_nodes_delimiter(nodes, '**', TextType.BOLD)
-    nodes = split_nodes_delimiter(nodes, '_', TextType.ITALIC)
-    nodes = split_nodes_delimiter(nodes, '`', TextType.CODE)
+    # One left-to-right walk that emits the same nodes as running split_nodes_image,
+    # split_nodes_link, split_nodes_quotes and the three split_nodes_delimiter
+    # passes in turn, without building the intermediate node lists.
+    if text == "" or is_plain_text(text):
+        return [TextNode(text, text_type=TextType.TEXT)]
+
+    nodes = []
+    if '![' not in text:
+        _scan_links(text, nodes)
+        return nodes
+    pos = 0
+    for image in IMAGE_PATTERN.finditer(text):
+        before = text[pos:image.start()]
+        if before:
+            _scan_links(before, nodes)
+        else:
+            nodes.append(TextNode(before, text_type=TextType.TEXT))
+        nodes.append(TextNode(image.group(1), text_type=TextType.IMAGE, url=image.group(2)))
+        pos = image.end()
+    if pos == 0 or pos < len(text):
+        _scan_links(text[pos:], nodes)
     return nodes
+
+
+def _scan_links(text, nodes):
+    if '](' not in text:
+        _scan_quotes(text, nodes)
+        return
+    pos = 0
+    for link in LINK_PATTERN.finditer(text):
+        if link.start() > pos:
+            _scan_quotes(text[pos:link.start()], nodes)
+        nodes.append(TextNode(link.group(1), text_type=TextType.LINK, url=link.group(2)))
+        pos = link.end()
+    if pos == 0 or pos < len(text):
+        _scan_quotes(text[pos:], nodes)
+
+
+def _scan_quotes(text, nodes):
+    if not (text.startswith('>') or '\n>' in text):
+        _scan_delimiters(text, nodes, 0)
+        return
+    quote_lines = []
+    other_lines = []
+    for line in text.split("\n"):
+        if line.startswith('>'):
+            quote_lines.append(line.lstrip('> ').strip())
+        else:
+            other_lines.append(line)
+    _scan_delimiters(' '.join(quote_lines), nodes, 0)
+    if other_lines:
+        _scan_delimiters('\n'.join(other_lines), nodes, 0)
+
+
+def _scan_delimiters(text, nodes, level):
+    if level == len(INLINE_DELIMITERS):
+        nodes.append(TextNode(text, text_type=TextType.TEXT))
+        return
+    delimiter, text_type = INLINE_DELIMITERS[level]
+    if delimiter not in text:
+        _scan_delimiters(text, nodes, level + 1)
+        return
+    parts = text.split(delimiter)
+    if len(parts) % 2 == 0:
+        raise Exception(f"Missing delimiter: {delimiter}")
+    for idx, val in enumerate(parts):
+        if idx % 2 == 0:
+            if val != "":
+                _scan_delimiters(val, nodes, level + 1)
+        else:
+            nodes.append(TextNode(val, text_type=text_type))
@@ -0,0 +1,50 @@
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def iter_tree(root):
+    # Yields (relative path, stat) for every file under root, with one scandir
+    # per directory and one stat per file. The order is fixed: a directory's
+    # files by name, then its subdirectories by name. Symlinks to directories
+    # are followed, except into a directory they are already inside of.
+    try:
+        root_stat = os.stat(root)
+    except (FileNotFoundError, NotADirectoryError):
+        return
+    # each directory carries the (device, inode) of itself and its parents
+    stack = [('', frozenset({(root_stat.st_dev, root_stat.st_ino)}))]
+    while stack:
+        rel_dir, ancestors = stack.pop()
+        try:
+            with os.scandir(os.path.join(root, rel_dir)) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        subdirs = []
+        for entry in entries:
+            rel_path = os.path.join(rel_dir, entry.name)
+            try:
+                if entry.is_dir():
+                    stat = entry.stat()
+                    key = (stat.st_dev, stat.st_ino)
+                    if key in ancestors:
+                        # a symlink to one of its own parents would never end
+                        logger.warning(f"Skipping {os.path.join(root, rel_path)}, it links back to a parent")
+                        continue
+                    subdirs.append((rel_path, ancestors | {key}))
+                    continue
+                stat = entry.stat()
+            except FileNotFoundError:
+                # removed since the directory was read, or a dangling symlink
+                continue
+            yield rel_path, stat
+        # reversed so the first subdirectory is walked next
+        stack.extend(reversed(subdirs))
+
+
+def scan_tree(root, suffix=''):
+    # the flat manifest of a tree: sorted (relative path, size, mtime_ns)
+    return [(rel_path, stat.st_size, stat.st_mtime_ns)
+            for rel_path, stat in iter_tree(root) if rel_path.endswith(suffix)]
@@ -0,0 +1,119 @@
+# named website, not site, which is the stdlib module Python imports at startup
+import os
+import shutil
+
+from frontmatter import split_front_matter
+from helper import generate_pages_recursive, read_text, render_output
+from images import process_images
+from linkcheck import check_links
+from manifest import load_manifest, save_manifest, invalidate_pages
+from postprocess import compress_tree, remove_compressed
+from profiler import NULL_PROFILER
+from sync import sync_static_files
+from template import find_template, load_template
+from writer import DEFAULT_IO_THREADS
+
+MANIFEST_PATH = '.build-manifest.json'
+
+
+class Site:
+    # One site's settings and warm caches, for embedding the generator in a
+    # long running process. Templates are loaded once and kept until reload(),
+    # so render_page and render_string only read and parse the markdown and
+    # never write anything. build() writes the whole site like main.py.
+    def __init__(self, content_dir='content', static_dir='static', dest_dir='docs', template_path='template.html',
+                 basepath='/', manifest_path=MANIFEST_PATH, ast_cache=None, minify=False, site_url=None, images=False,
+                 drafts=False):
+        self.content_dir = content_dir
+        self.static_dir = static_dir
+        self.dest_dir = dest_dir
+        self.template_path = template_path
+        self.basepath = basepath
+        self.manifest_path = manifest_path
+        self.ast_cache = ast_cache
+        self.minify = minify
+        self.site_url = site_url
+        self.images = images
+        self.drafts = drafts
+        # what process_images found, from the last build or the manifest
+        self.image_entries = None
+        # (section, None for pages at the top, front matter template name) -> template
+        self.templates = {}
+        # source path -> internal links the last build found no output for
+        self.broken_links = {}
+
+    def reload(self):
+        self.templates.clear()
+        self.image_entries = None
+
+    def template(self, section=None, name=None):
+        # name is a template named in a page's front matter
+        template = self.templates.get((section, name))
+        if template is None:
+            if section is None and name is None:
+                path = self.template_path
+            else:
+                path = find_template(os.path.join(self.content_dir, section or '', 'index.md'), self.content_dir,
+                                     self.template_path, name)
+            template = self.templates[(section, name)] = load_template(path, self.basepath)
+        return template
+
+    def render_string(self, markdown, section=None):
+        # the full page for markdown, using the template its front matter
+        # names or else the one of the given section
+        meta, _ = split_front_matter(markdown)
+        template = self.template(section, meta.get('template'))
+        if self.images and self.image_entries is None:
+            self.image_entries = load_manifest(self.manifest_path)['images']
+        html, _ = render_output(markdown, template, self.basepath, ast_cache=self.ast_cache, minify=self.minify,
+                                images=self.image_entries if self.images else None)
+        return html
+
+    def render_page(self, path):
+        # path is relative to the content directory, e.g. blog/tom/index.md
+        parts = os.path.normpath(path).split(os.sep)
+        section = parts[0] if len(parts) > 1 else None
+        return self.render_string(read_text(os.path.join(self.content_dir, path)), section)
+
+    def build(self, incremental=False, clean=False, jobs=1, profiler=NULL_PROFILER, explain=False,
+              hash_static=False, link_static=False, io_threads=DEFAULT_IO_THREADS, compress=False, check=True):
+        # returns the static files that failed to copy or process, the pages
+        # that failed to generate and the outputs that failed to compress
+        if clean:
+            shutil.rmtree(self.dest_dir, ignore_errors=True)
+            if os.path.exists(self.manifest_path):
+                os.remove(self.manifest_path)
+
+        manifest = load_manifest(self.manifest_path)
+        if not incremental:
+            invalidate_pages(manifest)
+
+        with profiler.stage('static'):
+            manifest['static'], copy_failures = sync_static_files(
+                self.static_dir, self.dest_dir, manifest['static'], use_hash=hash_static, hardlink=link_static,
+                minify=self.minify)
+        images = None
+        if self.images:
+            with profiler.stage('variants'):
+                manifest['images'], image_failures = process_images(self.static_dir, self.dest_dir,
+                                                                    manifest['images'], jobs)
+            copy_failures.extend(image_failures)
+            images = self.image_entries = manifest['images']
+        failures = generate_pages_recursive(
+            self.content_dir, self.template_path, self.dest_dir, self.basepath, manifest, jobs=jobs,
+            profiler=profiler, ast_cache=self.ast_cache, explain=explain, site_url=self.site_url,
+            io_threads=io_threads, minify=self.minify, images=images, static_dir=self.static_dir, drafts=self.drafts)
+        if check:
+            with profiler.stage('links'):
+                self.broken_links = check_links(manifest, self.dest_dir)
+        compress_failures = []
+        if compress:
+            with profiler.stage('compress'):
+                compress_failures = compress_tree(self.dest_dir, jobs, keep=manifest['static'])
+        elif manifest.get('compress'):
+            # the last build compressed, its siblings would now be served stale
+            with profiler.stage('compress'):
+                remove_compressed(self.dest_dir, manifest['static'])
+        manifest['compress'] = compress
+        save_manifest(self.manifest_path, manifest)
+        return copy_failures, failures, compress_failures
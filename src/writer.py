@@ -0,0 +1,168 @@
+import hashlib
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from manifest import hash_file
+from profiler import NULL_PROFILER
+
+# reads and writes mostly wait on the disk, or the network on mounted build
+# volumes, so more threads than CPUs pay off
+DEFAULT_IO_THREADS = 8
+# text is encoded this many characters at a time, so a page is never held as
+# bytes as well as a str
+ENCODE_CHUNK = 1 << 16
+
+
+def make_dirs(paths, made=None):
+    # creates the parent directory of every path in one pass, each only once.
+    # made is the directories already made, for callers that pass the paths a
+    # few at a time, the new ones are added to it.
+    dirs = sorted({os.path.dirname(path) for path in paths})
+    created = 0
+    for dir_path in dirs:
+        if made is not None:
+            if dir_path in made:
+                continue
+            made.add(dir_path)
+        if dir_path and not os.path.isdir(dir_path):
+            os.makedirs(dir_path, exist_ok=True)
+            created += 1
+    return created
+
+
+def read_ahead(executor, fn, items, depth):
+    # yields (item, fn(item)) in order, with fn running on executor for at
+    # most depth items ahead of the caller, so reads overlap whatever the
+    # caller does next without every file sitting in memory at once
+    queued = deque()
+    for item in items:
+        queued.append((item, executor.submit(fn, item)))
+        if len(queued) >= depth:
+            item, future = queued.popleft()
+            yield item, future.result()
+    while queued:
+        item, future = queued.popleft()
+        yield item, future.result()
+
+
+def encode_chunks(text):
+    for start in range(0, len(text), ENCODE_CHUNK):
+        yield text[start:start + ENCODE_CHUNK].encode("utf-8")
+
+
+def holds(path, digest, size, known=None):
+    # Whether path already holds size bytes hashing to digest. known is the
+    # hash path was last written with, from the manifest, so the old file need
+    # not be read back. Without it the file is hashed when the size matches.
+    try:
+        if os.path.getsize(path) != size:
+            return False
+    except FileNotFoundError:
+        return False
+    return (known if known is not None else hash_file(path)) == digest
+
+
+def write_text(path, text, known=None):
+    # Leaves the file, and its mtime, alone when it already holds text, so
+    # rsync and friends only see the outputs that really changed. Returns
+    # (whether it wrote, the hash of text).
+    h = hashlib.sha256()
+    size = 0
+    for chunk in encode_chunks(text):
+        h.update(chunk)
+        size += len(chunk)
+    digest = h.hexdigest()
+    if holds(path, digest, size, known):
+        return False, digest
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in encode_chunks(text):
+                f.write(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return True, digest
+
+
+def write_if_changed(path, text, known=None):
+    # whether it wrote, see write_text
+    return write_text(path, text, known)[0]
+
+
+class OutputFile:
+    # A file the output is streamed into chunk by chunk, written next to path
+    # and only swapped in on close when it came out different from what path
+    # holds, see holds. written and digest are set once it is closed.
+    def __init__(self, path, known=None):
+        self.path = path
+        self.known = known
+        self.tmp_path = f"{path}.tmp"
+        self.hash = hashlib.sha256()
+        self.size = 0
+        self.written = False
+        self.digest = None
+
+    def __enter__(self):
+        self.file = open(self.tmp_path, "wb")
+        return self
+
+    def write(self, text):
+        data = text.encode("utf-8")
+        self.hash.update(data)
+        self.size += len(data)
+        self.file.write(data)
+
+    def writelines(self, chunks):
+        for text in chunks:
+            self.write(text)
+
+    def __exit__(self, exc_type, *exc_info):
+        self.file.close()
+        try:
+            if exc_type is None:
+                self.digest = self.hash.hexdigest()
+                if not holds(self.path, self.digest, self.size, self.known):
+                    os.replace(self.tmp_path, self.path)
+                    self.written = True
+        finally:
+            if os.path.exists(self.tmp_path):
+                os.remove(self.tmp_path)
+        return False
+
+
+class WriteQueue:
+    # Writes outputs on a pool of threads while the caller renders the next
+    # page. submit() returns a future that resolves to whether the file was
+    # written and the hash of the text, see write_text, or raises what the
+    # write raised. Once max_pending writes are queued submit() waits for the
+    # oldest, so rendered pages can not pile up in memory behind a slow disk.
+    def __init__(self, threads=DEFAULT_IO_THREADS, profiler=NULL_PROFILER, max_pending=None):
+        threads = max(1, threads)
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='writer')
+        self.profiler = profiler
+        self.max_pending = max_pending or threads * 4
+        self.pending = deque()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def submit(self, path, text, page=None, known=None):
+        while len(self.pending) >= self.max_pending:
+            wait([self.pending.popleft()])
+        future = self.executor.submit(self._write, path, text, page, known)
+        self.pending.append(future)
+        return future
+
+    def _write(self, path, text, page, known):
+        with self.profiler.stage('write', page):
+            return write_text(path, text, known)
+
+    def close(self):
+        self.executor.shutdown(wait=True)